@@ -0,0 +1,70 @@
+'''
+Micro-benchmark of memory per object, allocation rate and operator throughput of the siemens.electricity types,
+compared to the former classes with a per-instance __dict__, kept in benchmarks.legacy_electricity.
+
+    python -m benchmarks.bench_electricity
+'''
+from __future__ import unicode_literals, print_function, division
+import gc
+import timeit
+import tracemalloc
+
+from benchmarks import legacy_electricity as legacy
+from siemens import electricity as current
+
+
+def memory_per_object(factory, count=10000):
+    ''' Bytes allocated per object, including nested objects such as the Power of a Phase. '''
+    gc.collect()
+    tracemalloc.start()
+    objects = [factory() for _ in range(count)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return size / count
+
+
+def allocations_per_second(factory, number=200000):
+    return number / timeit.timeit(factory, number=number)
+
+
+def constructors(module):
+    return [
+        ('Power', lambda: module.Power(1.0, 2.0, 3.0)),
+        ('Energy', lambda: module.Energy(1.0, 2.0, 3.0)),
+        ('Tariff', lambda: module.Tariff(module.Energy(), module.Energy())),
+        ('Phase', lambda: module.Phase(230.0, 1.0, 230.0, 200.0)),
+    ]
+
+
+def operators(module):
+    p1, p2 = module.Power(3.0, 2.0), module.Power(2.0, 1.0)
+    e1, e2 = module.Energy(3.0, 2.0, 1.0), module.Energy(2.0, 1.0, 1.0)
+    t1, t2 = module.Tariff(e1, e2), module.Tariff(e2, e1)
+    l1, l2 = module.Phase(230.0, 1.0, 230.0, 200.0), module.Phase(231.0, 2.0, 462.0, 400.0)
+    return [
+        ('Power + Power', lambda: p1 + p2),
+        ('Power * seconds', lambda: p1 * 3600),
+        ('Energy / seconds', lambda: e1 / 3600),
+        ('Tariff - Tariff', lambda: t1 - t2),
+        ('Phase + Phase', lambda: l1 + l2),
+    ]
+
+
+def main():
+    print('%-8s %14s %14s %16s %16s' % ('type', 'bytes (slots)', 'bytes (dict)', 'allocs/s (slots)', 'allocs/s (dict)'))
+    for (name, slotted), (_, former) in zip(constructors(current), constructors(legacy)):
+        print('%-8s %14.1f %14.1f %16.0f %16.0f' % (
+            name,
+            memory_per_object(slotted), memory_per_object(former),
+            allocations_per_second(slotted), allocations_per_second(former),
+        ))
+
+    print()
+    print('%-18s %16s %16s' % ('operator', 'ops/s (slots)', 'ops/s (dict)'))
+    for (label, slotted), (_, former) in zip(operators(current), operators(legacy)):
+        print('%-18s %16.0f %16.0f' % (label, allocations_per_second(slotted), allocations_per_second(former)))
+
+
+if __name__ == '__main__':
+    main()
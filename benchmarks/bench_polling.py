@@ -0,0 +1,111 @@
+'''
+Polling throughput and latency benchmark against the in-process simulator.
+Reports reads per second, p50/p99 latency of PAC.read() and memory allocated per read,
+for a single device, a PACFleet and AsyncPACx200 devices.
+
+    python -m benchmarks.bench_polling --reads 500 --devices 50 --latency 0.005
+'''
+from __future__ import unicode_literals, print_function, division
+import argparse
+import asyncio
+import timeit
+import tracemalloc
+
+from siemens.aio import AsyncPACx200
+from siemens.fleet import PACFleet
+from siemens.pac import PACx200
+from siemens.simulator import PACSimulator, TcpSimulator
+
+clock = timeit.default_timer
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def report(name, latencies, elapsed, reads, allocated=None):
+    print('%-10s %10.1f reads/s   p50 %7.2f ms   p99 %7.2f ms%s' % (
+        name, reads / elapsed,
+        percentile(latencies, 50) * 1000, percentile(latencies, 99) * 1000,
+        '' if allocated is None else '   %6.1f KiB/read' % (allocated / 1024),
+    ))
+
+
+def allocated_per_read(pac, reads=20):
+    ''' Peak memory allocated while reading, averaged over reads. '''
+    peaks = []
+    tracemalloc.start()
+    for _ in range(reads):
+        tracemalloc.reset_peak()
+        start = tracemalloc.get_traced_memory()[0]
+        pac.read()
+        peaks.append(tracemalloc.get_traced_memory()[1] - start)
+    tracemalloc.stop()
+    return sum(peaks) / len(peaks)
+
+
+def bench_single(address, reads):
+    pac = PACx200(*address)
+    pac.read()
+    latencies = []
+    started = clock()
+    for _ in range(reads):
+        start = clock()
+        pac.read()
+        latencies.append(clock() - start)
+    elapsed = clock() - started
+    report('single', latencies, elapsed, reads, allocated_per_read(pac))
+    pac.close()
+
+
+def bench_fleet(address, devices, cycles):
+    fleet = PACFleet([PACx200(*address) for _ in range(devices)], interval=0, timeout=5, max_workers=32)
+    latencies = []
+    started = clock()
+    for _ in range(cycles):
+        start = clock()
+        snapshot = fleet.poll()
+        latencies.append(clock() - start)
+        assert not snapshot.errors, snapshot.errors
+    elapsed = clock() - started
+    report('fleet', latencies, elapsed, devices * cycles)
+    fleet.close()
+
+
+def bench_async(address, devices, cycles):
+    async def main():
+        pacs = [AsyncPACx200(*address) for _ in range(devices)]
+        latencies = []
+        started = clock()
+        for _ in range(cycles):
+            start = clock()
+            await asyncio.gather(*(pac.read() for pac in pacs))
+            latencies.append(clock() - start)
+        elapsed = clock() - started
+        for pac in pacs:
+            pac.close()
+        return latencies, elapsed
+
+    latencies, elapsed = asyncio.run(main())
+    report('async', latencies, elapsed, devices * cycles)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--reads', type=int, default=500, help='reads of the single device')
+    parser.add_argument('--devices', type=int, default=50, help='devices polled by fleet and async')
+    parser.add_argument('--cycles', type=int, default=20, help='polling cycles of fleet and async')
+    parser.add_argument('--latency', type=float, default=0.0, help='simulated device latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='simulated latency jitter in seconds')
+    args = parser.parse_args()
+
+    simulator = PACSimulator(latency=args.latency, jitter=args.jitter, seed=0)
+    with TcpSimulator(simulator) as server:
+        bench_single(server.address, args.reads)
+        bench_fleet(server.address, args.devices, args.cycles)
+        bench_async(server.address, args.devices, args.cycles)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+'''
+Reprocessing throughput of captured registers replayed through PAC.read().
+A capture of simulated reads, one per second, is written and replayed at full speed.
+
+    python -m benchmarks.bench_replay --reads 100000
+'''
+from __future__ import unicode_literals, print_function, division
+import argparse
+import os
+import shutil
+import tempfile
+import timeit
+
+from siemens.capture import CaptureWriter, ReplayMaster
+from siemens.pac import PAC
+from siemens.simulator import PACSimulator
+
+clock = timeit.default_timer
+
+
+def write_capture(path, reads):
+    simulator = PACSimulator()
+    plan = PAC()._plan(('power', 'phases', 'frequency', 'energy'))
+    blocks = [(block.start, [simulator.registers.get(x, 0) for x in range(block.start, block.start + block.count)])
+              for block in plan]
+    with CaptureWriter(path) as capture:
+        for i in range(reads):
+            for start, registers in blocks:
+                capture.record('pac', 1, start, registers, timestamp=float(i))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--reads', type=int, default=100000, help='reads in the capture')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'bench.cap')
+        write_capture(path, args.reads)
+
+        pac = PAC()
+        pac._master = ReplayMaster(path)
+        pac._unit = 1
+        reads = 0
+        started = clock()
+        try:
+            while True:
+                pac.read()
+                reads += 1
+        except EOFError:
+            pass
+        elapsed = clock() - started
+        pac.close()
+
+        print('%d reads (%.1f days at 1 s) from %.1f MiB in %.2f s: %.0f reads/s' % (
+            reads, reads / 86400, os.path.getsize(path) / 2 ** 20, elapsed, reads / elapsed))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
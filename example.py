@@ -1,13 +1,7 @@
-import time
 from siemens.pac import PACx200
 
-times = []
-
 p = PACx200('192.168.0.80')
-while True:
-    try:
-        p.read()
-        print(p.as_dict(replace_nan=True))
-    except:
-        break
-    time.sleep(1)
+for sample in p.stream(1):
+    if sample.missed:
+        print('Missed %d reads' % sample.missed)
+    print(p.as_dict(replace_nan=True))
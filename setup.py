@@ -1,5 +1,5 @@
 #!/usr/bin/env python
-from distutils.core import setup
+from setuptools import setup
 
 setup(
     name='siemens-pac',
@@ -9,7 +9,8 @@ setup(
     author_email='kipenroskaposti@gmail.com',
     url='https://github.com/kipe/siemens-pac',
     packages=['siemens'],
+    python_requires='>=3.8',
     install_requires=[
-        'modbus-tk>=0.4.3',
+        'modbus-tk>=0.5.4',
         'pyserial>=2.7',
     ])
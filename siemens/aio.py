@@ -0,0 +1,248 @@
+'''
+asyncio variants of the PAC classes, for polling many devices concurrently from a single event loop.
+'''
+from __future__ import unicode_literals, print_function, division
+import asyncio
+from struct import Struct
+from time import time
+from modbus_tk.defines import READ_INPUT_REGISTERS, WRITE_MULTIPLE_REGISTERS
+from modbus_tk.exceptions import ModbusError, ModbusInvalidResponseError
+
+from siemens.batch import WriteBatch
+from siemens.pac import PAC, Sample, _Flight
+from siemens.registers import REGISTERS, merge_writes, to_bytes
+from siemens.timing import Ticker, clock, monotonic
+
+_MBAP = Struct(str('>HHHB'))
+_READ_REQUEST = Struct(str('>BHH'))
+_WRITE_REQUEST = Struct(str('>BHHB'))
+_WRITE_RESPONSE = Struct(str('>HH'))
+
+
+class AsyncTcpMaster(object):
+    '''
+    Minimal Modbus TCP/IP master on top of asyncio streams.
+    Register reads return the raw big-endian register bytes, which PAC decodes without
+    building a tuple of register values.
+    '''
+    def __init__(self, host, port=502, timeout=5.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._reader = None
+        self._writer = None
+        self._transaction_id = 0
+        self._lock = None
+
+    async def open(self):
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), self.timeout)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    def _next_transaction_id(self):
+        self._transaction_id = (self._transaction_id + 1) & 0xffff
+        return self._transaction_id
+
+    async def _transaction(self, unit, pdu):
+        await self.open()
+        transaction_id = self._next_transaction_id()
+        self._writer.write(_MBAP.pack(transaction_id, 0, len(pdu) + 1, unit) + pdu)
+        await self._writer.drain()
+
+        header = await self._reader.readexactly(_MBAP.size)
+        response_id, protocol, length, response_unit = _MBAP.unpack(header)
+        response = await self._reader.readexactly(length - 1)
+
+        if response_id != transaction_id or protocol != 0 or response_unit != unit:
+            raise ModbusInvalidResponseError('Invalid MBAP header in response.')
+        if response[0] & 0x80:
+            raise ModbusError(response[1])
+        if response[0] != pdu[0]:
+            raise ModbusInvalidResponseError('Invalid function code in response.')
+        return response
+
+    async def execute(self, unit, function_code, starting_address, quantity_of_x=0, output_value=None):
+        '''
+        Executes READ_INPUT_REGISTERS or WRITE_MULTIPLE_REGISTERS.
+        Reads return raw register bytes, writes return (starting_address, quantity).
+        '''
+        if function_code == READ_INPUT_REGISTERS:
+            pdu = _READ_REQUEST.pack(function_code, starting_address, quantity_of_x)
+        elif function_code == WRITE_MULTIPLE_REGISTERS:
+            data = to_bytes(output_value)
+            pdu = _WRITE_REQUEST.pack(function_code, starting_address, len(data) // 2, len(data)) + data
+        else:
+            raise ValueError('Unsupported function code %d.' % function_code)
+
+        # Lock is created lazily, so that the master can be constructed outside of the event loop
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            try:
+                response = await asyncio.wait_for(self._transaction(unit, pdu), self.timeout)
+                if function_code == READ_INPUT_REGISTERS and response[1] != len(response) - 2:
+                    raise ModbusInvalidResponseError('Invalid byte count in response.')
+            except ModbusError:
+                # Exception responses leave the connection in step
+                raise
+            except BaseException:
+                # After a timeout, cancellation or invalid response, a late response could be taken for the next request
+                self.close()
+                raise
+
+        if function_code == WRITE_MULTIPLE_REGISTERS:
+            return _WRITE_RESPONSE.unpack(response[1:5])
+        return response[2:]
+
+
+class AsyncPAC(PAC):
+    '''
+    asyncio variant of PAC. Reading methods are coroutines, but update the same
+    Power, Phase and Tariff objects as their PAC counterparts.
+    '''
+    async def _execute(self, *args, **kwargs):
+        if self._master is None or self._unit is None:
+            raise ValueError('Connection uninitialized.')
+
+        start = clock()
+        attempt = 0
+        while True:
+            try:
+                result = await self._master.execute(self._unit, *args, **kwargs)
+                break
+            except (IOError, OSError, asyncio.TimeoutError) as e:
+                if attempt >= self.retries:
+                    if self.metrics is not None:
+                        self._record(start, attempt, e, *args, **kwargs)
+                    raise
+                attempt += 1
+
+        if self.metrics is not None:
+            self._record(start, attempt, None, *args, **kwargs)
+        return result
+
+    async def read_input_register(self, register_start, count=1):
+        return self._registers(register_start, await self._execute(READ_INPUT_REGISTERS, register_start, count))
+
+    async def _read_blocks(self, groups):
+        plan = self._plan(groups)
+        for block in plan:
+            self._update_block(block, await self.read_input_register(block.start, block.count))
+        return len(plan)
+
+    def _expire(self, groups):
+        for group in groups:
+            self._fresh.pop(group, None)
+            self._flights.pop(group, None)
+
+    async def _read_cached(self, groups):
+        if self.cache_ttl is None:
+            return await self._read_blocks(groups)
+
+        while True:
+            stale, flight = self._pending(groups)
+            if flight is None:
+                break
+            await flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+        if not stale:
+            return 0
+        flight = _Flight(asyncio.Event())
+        self._claim(stale, flight)
+
+        started = monotonic()
+        # Seen by waiters if the read is interrupted, e.g. cancelled
+        error = IOError('Read was interrupted.')
+        try:
+            transactions = await self._read_blocks(stale)
+            error = None
+            return transactions
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._finish(stale, flight, started, error)
+            flight.event.set()
+
+    async def _read_group(self, group):
+        await self._read_cached((group, ))
+
+    async def read_power(self):
+        await self._read_group('power')
+
+    async def read_phases(self):
+        await self._read_group('phases')
+
+    async def read_frequency(self):
+        await self._read_group('frequency')
+
+    async def read_energy(self):
+        await self._read_group('energy')
+
+    async def read(self, groups=tuple(REGISTERS)):
+        self.transactions = await self._read_cached(groups)
+
+    async def stream(self, interval, groups=tuple(REGISTERS)):
+        '''
+        Asynchronous generator reading given quantity groups every interval seconds, yielding Samples.
+        See PAC.stream().
+        '''
+        ticker = Ticker(interval)
+        while True:
+            delay, missed = ticker.delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            timestamp = time()
+            await self.read(groups)
+            yield Sample(timestamp, ticker.tick, missed, self.values())
+
+    def batch(self):
+        ''' Returns an AsyncWriteBatch queueing register writes to this PAC. '''
+        return AsyncWriteBatch(self)
+
+    async def clear_tariff(self, tariff):
+        batch = self.batch()
+        batch.clear_tariff(tariff)
+        await batch.commit()
+
+
+class AsyncWriteBatch(WriteBatch):
+    ''' WriteBatch of an AsyncPAC, sent with await batch.commit(). See WriteBatch.commit(). '''
+    async def commit(self, verify=True):
+        pac = self.pac
+        blocks = merge_writes(self._registers)
+        try:
+            for start, values in blocks:
+                await pac._execute(WRITE_MULTIPLE_REGISTERS, start, 0, values)
+        finally:
+            pac._expire(self._groups(blocks))
+        transactions = len(blocks)
+
+        if verify and blocks:
+            plan = self._plan(blocks)
+            results = []
+            for block in plan:
+                results.append(await pac._execute(READ_INPUT_REGISTERS, block.start, block.count))
+            self._verify(plan, results)
+            transactions += len(plan)
+
+        self._registers.clear()
+        return transactions
+
+
+class AsyncPACx200(AsyncPAC):
+    '''
+    Class for connecting to PAC3200 and PAC4200 through Modbus TCP/IP using asyncio.
+    '''
+    def __init__(self, host, port=502, timeout=5.0, unit=1):
+        self._unit = unit
+        self._master = AsyncTcpMaster(host, port, timeout)
+        self.name = '%s:%d/%d' % (host, port, unit)
+
+        super(AsyncPACx200, self).__init__()
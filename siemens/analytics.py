@@ -0,0 +1,120 @@
+'''
+Vectorized three-phase analytics of many meters at once, on arrays of shape (meters, phases):
+
+    keys, phases = stack(fleet.poll().results)
+    pf = power_factor(phases.apparent, phases.active)
+    unbalanced = imbalance(phases.voltage) > 0.02
+
+NaN values propagate like in siemens.electricity, but invalid results, such as the reactive power
+of active power exceeding apparent power or the power factor of zero apparent power, are NaN instead of errors.
+Requires NumPy.
+'''
+from __future__ import unicode_literals, print_function, division
+from collections import namedtuple
+
+import numpy
+
+from siemens.pac import PAC
+
+PHASES = ('L1', 'L2', 'L3')
+
+# Arrays of shape (meters, phases)
+Phases = namedtuple('Phases', ['voltage', 'current', 'apparent', 'active'])
+# Arrays of shape (sites, ), summed like Phase.__add__, with voltage averaged
+Totals = namedtuple('Totals', ['sites', 'voltage', 'current', 'apparent', 'active', 'reactive'])
+
+_COLUMNS = dict(
+    (name, [PAC.FIELDS.index('phases.%s.%s' % (phase, field)) for phase in PHASES])
+    for name, field in (
+        ('voltage', 'voltage'), ('current', 'current'), ('apparent', 'power.apparent'), ('active', 'power.active'))
+)
+
+
+def _items(devices):
+    if isinstance(devices, dict):
+        return list(devices.keys()), list(devices.values())
+    devices = list(devices)
+    return list(range(len(devices))), devices
+
+
+def _value(phase, name):
+    if name in ('voltage', 'current'):
+        return phase[name]['value']
+    return phase['power'][name]['value']
+
+
+def stack(devices):
+    '''
+    Returns (keys, Phases) of PACs, or of their PAC.as_dict() results such as FleetSnapshot.results,
+    given as a list (keyed by index) or a dict.
+    '''
+    keys, devices = _items(devices)
+    if devices and isinstance(devices[0], dict):
+        columns = dict(
+            (name, numpy.array([
+                [_value(device['phases'][phase], name) for phase in PHASES] for device in devices
+            ], dtype=float).reshape(len(devices), len(PHASES)))
+            for name in Phases._fields
+        )
+        return keys, Phases(**columns)
+
+    values = numpy.array([device.values() for device in devices], dtype=float).reshape(len(devices), len(PAC.FIELDS))
+    return keys, Phases(**dict((name, values[:, columns]) for name, columns in _COLUMNS.items()))
+
+
+def phase_powers(voltage, current, apparent, active):
+    '''
+    Returns (apparent, active) powers like Phase.__init__: where both are NaN,
+    apparent power is calculated from voltage and current.
+    '''
+    apparent = numpy.asarray(apparent, dtype=float)
+    missing = numpy.isnan(apparent) & numpy.isnan(active)
+    return numpy.where(missing, numpy.multiply(voltage, current), apparent), numpy.asarray(active, dtype=float)
+
+
+def reactive(apparent, active, reactive=None):
+    ''' Returns reactive powers like Power.reactive, calculated where not given or NaN. '''
+    with numpy.errstate(invalid='ignore'):
+        calculated = numpy.sqrt(numpy.square(apparent) - numpy.square(active))
+    if reactive is None:
+        return calculated
+    reactive = numpy.asarray(reactive, dtype=float)
+    return numpy.where(numpy.isnan(reactive), calculated, reactive)
+
+
+def power_factor(apparent, active):
+    ''' Returns power factors like Power.power_factor, NaN for zero apparent power. '''
+    apparent = numpy.asarray(apparent, dtype=float)
+    with numpy.errstate(invalid='ignore', divide='ignore'):
+        return numpy.where(apparent == 0, numpy.nan, numpy.divide(active, apparent))
+
+
+def imbalance(values, axis=-1):
+    '''
+    Returns imbalance of phase voltages or currents: maximum deviation from the average of the phases,
+    relative to the average. NaN if any phase is NaN or the average is zero.
+    '''
+    values = numpy.asarray(values, dtype=float)
+    mean = values.mean(axis=axis, keepdims=True)
+    with numpy.errstate(invalid='ignore', divide='ignore'):
+        result = (numpy.abs(values - mean).max(axis=axis, keepdims=True) / mean).squeeze(axis)
+    return numpy.where(mean.squeeze(axis) == 0, numpy.nan, result)
+
+
+def site_totals(phases, sites):
+    '''
+    Returns Totals of meters grouped by sites, a label for each meter.
+    Currents and powers are summed over phases and meters and voltages averaged, NaN propagating to the total.
+    Reactive power is calculated from the totals like Power.reactive of a sum of Powers.
+    '''
+    labels, inverse = numpy.unique(numpy.asarray(sites), return_inverse=True)
+    inverse = inverse.reshape(-1)
+    count = len(labels)
+
+    def total(values):
+        return numpy.bincount(inverse, weights=numpy.asarray(values, dtype=float).sum(axis=1), minlength=count)
+
+    meters = numpy.bincount(inverse, minlength=count)
+    voltage = total(phases.voltage) / (meters * phases.voltage.shape[1])
+    apparent, active = total(phases.apparent), total(phases.active)
+    return Totals(labels, voltage, total(phases.current), apparent, active, reactive(apparent, active))
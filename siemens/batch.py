@@ -0,0 +1,124 @@
+from __future__ import unicode_literals, print_function, division
+from modbus_tk.defines import READ_INPUT_REGISTERS, WRITE_MULTIPLE_REGISTERS
+
+from siemens.registers import REGISTERS, ReadBlock, decode, from_bytes, merge_ranges, merge_writes
+
+_ENERGY_START, _ENERGY_COUNT = REGISTERS['energy']
+
+
+def _counter(register):
+    ''' Returns the first register of the energy counter (a double) containing register, or None. '''
+    offset = register - _ENERGY_START
+    if 0 <= offset < _ENERGY_COUNT:
+        return _ENERGY_START + offset // 4 * 4
+    return None
+
+
+class WriteBatch(object):
+    '''
+    Register writes queued for a PAC, sent by WriteBatch.commit() in as few WRITE_MULTIPLE_REGISTERS
+    transactions as possible. Writes to contiguous registers are merged, later writes replacing earlier ones:
+
+        batch = pac.batch()
+        batch.clear_tariff(1)
+        batch.clear_tariff(2)
+        batch.commit()  # A single write, verified by a single read
+
+    With a pipelining master, such as siemens.pipeline.PipelinedTcpMaster, all transactions are sent at once.
+    '''
+    # Energy counters keep counting after being written, so they may read back larger by this much (Wh, VARh or VAh)
+    max_counted = 1000.0
+
+    def __init__(self, pac):
+        self.pac = pac
+        self._registers = {}
+
+    def __len__(self):
+        ''' Number of registers queued. '''
+        return len(self._registers)
+
+    def write(self, start, values):
+        ''' Queues writing uint16 values to registers starting from start. '''
+        for i, value in enumerate(values):
+            self._registers[start + i] = value
+
+    def clear_tariff(self, tariff):
+        ''' Queues clearing energy counters of tariff 1 or 2. '''
+        for x in self.pac._tariff_registers(tariff):
+            self.write(x, [0, 0, 0, 0])
+
+    @staticmethod
+    def _groups(blocks):
+        ''' Returns quantity groups with registers written by blocks. '''
+        return [
+            group for group, (start, count) in REGISTERS.items()
+            if any(x < start + count and start < x + len(values) for x, values in blocks)
+        ]
+
+    def _plan(self, blocks):
+        ''' Returns ReadBlocks reading back the registers written, along with whole quantity groups they're part of. '''
+        groups = self._groups(blocks)
+        ranges = [(start, len(values)) for start, values in blocks] + [REGISTERS[group] for group in groups]
+        return [
+            ReadBlock(start, count, tuple(
+                group for group in groups
+                if start <= REGISTERS[group][0] and sum(REGISTERS[group]) <= start + count
+            ))
+            for start, count in merge_ranges(ranges, self.pac.max_read_count, self.pac.max_read_gap)
+        ]
+
+    def _check_counter(self, counter, registers):
+        written = decode([self._registers[x] for x in range(counter, counter + 4)], 'd')[0]
+        value = decode(registers, 'd')[0]
+        if not written <= value <= written + self.max_counted:
+            raise IOError('Energy counter at register %d reads %r after writing %r.' % (counter, value, written))
+
+    def _check(self, start, registers):
+        ''' Raises IOError if registers read from start don't match those written. '''
+        for register, value in enumerate(registers, start):
+            expected = self._registers.get(register)
+            if expected is None:
+                continue
+            counter = _counter(register)
+            if counter is not None and all(x in self._registers for x in range(counter, counter + 4)):
+                # Counters written as a whole are compared as doubles
+                if register == counter:
+                    self._check_counter(counter, registers[counter - start:counter - start + 4])
+                continue
+            if value != expected:
+                raise IOError('Register %d reads %d after writing %d.' % (register, value, expected))
+
+    def _verify(self, plan, results):
+        ''' Checks registers read back by plan, and updates quantity groups of the PAC from them. '''
+        pac = self.pac
+        for block, result in zip(plan, results):
+            result = pac._registers(block.start, result)
+            registers = from_bytes(result) if isinstance(result, (bytes, bytearray, memoryview)) else result
+            if len(registers) != block.count:
+                raise IOError('Register read failed.')
+            self._check(block.start, registers)
+            pac._update_block(block, result)
+
+    def commit(self, verify=True):
+        '''
+        Sends queued writes, returning number of transactions used. Cached values of quantity groups written are dropped.
+        If verify is set, registers written are read back along with the quantity groups they're part of,
+        raising IOError if they differ, and the PAC is updated from them. Energy counters only need to read back
+        at least the value written, and at most WriteBatch.max_counted more, as they keep counting.
+        '''
+        pac = self.pac
+        blocks = merge_writes(self._registers)
+        try:
+            pac._execute_all([(WRITE_MULTIPLE_REGISTERS, start, 0, values) for start, values in blocks])
+        finally:
+            # Values read before, or by a read in progress, are out of date even if some of the writes failed
+            pac._expire(self._groups(blocks))
+        transactions = len(blocks)
+
+        if verify and blocks:
+            plan = self._plan(blocks)
+            self._verify(plan, pac._execute_all([(READ_INPUT_REGISTERS, block.start, block.count) for block in plan]))
+            transactions += len(plan)
+
+        self._registers.clear()
+        return transactions
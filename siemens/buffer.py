@@ -0,0 +1,117 @@
+from __future__ import unicode_literals, print_function, division
+from array import array
+from bisect import bisect_left
+from time import time
+
+from siemens.pac import PAC
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class SampleBuffer(object):
+    '''
+    Fixed-capacity ring buffer storing timestamps and PAC values in columns,
+    instead of keeping Power, Phase and Tariff objects around for every read.
+
+    Each value is stored once. Samples in chronological order are one or two runs in memory,
+    as the ring wraps around: columns are returned as zero-copy views when the requested
+    samples are in one run, and copied when they span both. Views are valid until
+    the next append overwrites the samples in them.
+
+    Columns are array('d') (or 'f', for half the memory) or, with use_numpy,
+    NumPy arrays of the same type.
+    '''
+    def __init__(self, capacity, fields=PAC.FIELDS, typecode='d', use_numpy=False):
+        if use_numpy and numpy is None:
+            raise ImportError('use_numpy requires NumPy.')
+        self.capacity = capacity
+        self.fields = tuple(fields)
+        self._positions = dict((name, i) for i, name in enumerate(self.fields))
+        self._select = None if self.fields == PAC.FIELDS else [PAC.FIELDS.index(name) for name in self.fields]
+
+        if use_numpy:
+            self._timestamps = numpy.zeros(capacity, dtype='d')
+            self._columns = [numpy.zeros(capacity, dtype=typecode) for _ in self.fields]
+        else:
+            self._timestamps = array(str('d'), [0.0]) * capacity
+            self._columns = [array(str(typecode), [0.0]) * capacity for _ in self.fields]
+        self._head = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, timestamp, values):
+        ''' Appends a sample with values in the order of SampleBuffer.fields. '''
+        i = self._head
+        self._timestamps[i] = timestamp
+        for column, value in zip(self._columns, values):
+            column[i] = value
+        self._head = (i + 1) % self.capacity
+        if self._size < self.capacity:
+            self._size += 1
+
+    def append_pac(self, pac, timestamp=None):
+        ''' Appends current values of a PAC. Timestamp defaults to current time. '''
+        values = pac.values()
+        if self._select is not None:
+            values = [values[i] for i in self._select]
+        self.append(time() if timestamp is None else timestamp, values)
+
+    def _runs(self, column):
+        ''' Returns views of the older and newer run of samples in a column. '''
+        offset = (self._head - self._size) % self.capacity
+        end = offset + self._size
+        if isinstance(column, array):
+            column = memoryview(column)
+        if end <= self.capacity:
+            return column[offset:end], column[:0]
+        return column[offset:], column[:end - self.capacity]
+
+    def _view(self, column, window):
+        start, stop, _ = window.indices(self._size)
+        stop = max(start, stop)
+        older, newer = self._runs(column)
+        split = len(older)
+        if stop <= split:
+            return older[start:stop]
+        if start >= split:
+            return newer[start - split:stop - split]
+
+        # Samples span the end of the ring, so they're copied into a single run
+        older, newer = older[start:], newer[:stop - split]
+        if isinstance(older, memoryview):
+            return array(str(older.format), older.tobytes() + newer.tobytes())
+        return numpy.concatenate((older, newer))
+
+    def timestamps(self, window=slice(None)):
+        ''' Returns sample timestamps in chronological order, as a view unless they span the end of the ring. '''
+        return self._view(self._timestamps, window)
+
+    def column(self, name, window=slice(None)):
+        '''
+        Returns values of a field in chronological order, as a view unless they span the end of the ring.
+        Window is a slice of sample positions, see SampleBuffer.window().
+        '''
+        return self._view(self._columns[self._positions[name]], window)
+
+    def _position(self, timestamp):
+        # Older samples all precede newer ones, so positions in the runs add up
+        older, newer = self._runs(self._timestamps)
+        if isinstance(older, memoryview):
+            return bisect_left(older, timestamp) + bisect_left(newer, timestamp)
+        return int(numpy.searchsorted(older, timestamp)) + int(numpy.searchsorted(newer, timestamp))
+
+    def window(self, since=None, until=None):
+        ''' Returns a slice of sample positions with timestamps in [since, until), without copying timestamps. '''
+        start = 0 if since is None else self._position(since)
+        stop = self._size if until is None else self._position(until)
+        return slice(start, stop)
+
+    @property
+    def nbytes(self):
+        ''' Memory used by the column storage. '''
+        return sum(len(column) * column.itemsize for column in [self._timestamps] + self._columns)
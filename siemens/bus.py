@@ -0,0 +1,110 @@
+from __future__ import unicode_literals, print_function, division
+from collections import deque
+from threading import Condition, Lock
+from time import sleep
+
+from siemens.pac import PAC3100
+from siemens.timing import monotonic
+
+
+class FairScheduler(object):
+    '''
+    Serializes transactions of several units, granting turns to waiting units in round-robin order,
+    so that a unit with many queued requests can't starve the others.
+    '''
+    def __init__(self):
+        self._condition = Condition(Lock())
+        self._waiting = {}
+        self._ready = deque()
+        self._granted = None
+        self._busy = False
+
+    def _grant(self):
+        if not self._ready:
+            return
+        unit = self._ready.popleft()
+        queue = self._waiting[unit]
+        self._granted = queue.popleft()
+        if queue:
+            self._ready.append(unit)
+        self._busy = True
+        self._condition.notify_all()
+
+    def acquire(self, unit):
+        with self._condition:
+            ticket = object()
+            queue = self._waiting.setdefault(unit, deque())
+            if not queue:
+                self._ready.append(unit)
+            queue.append(ticket)
+            if not self._busy:
+                self._grant()
+            while self._granted is not ticket:
+                self._condition.wait()
+            self._granted = None
+
+    def release(self):
+        with self._condition:
+            self._busy = False
+            self._grant()
+
+
+class _BusMaster(object):
+    ''' Master handed to PAC3100 units on a RtuBus. Closing a unit leaves the shared bus open. '''
+    def __init__(self, bus):
+        self._bus = bus
+        self.port = bus.port
+
+    def execute(self, unit, *args, **kwargs):
+        return self._bus.execute(unit, *args, **kwargs)
+
+    def set_timeout(self, timeout_in_sec):
+        self._bus.set_timeout(timeout_in_sec)
+
+    def close(self):
+        pass
+
+
+class RtuBus(object):
+    '''
+    Owns a single serial port and Modbus RTU master, shared by PAC3100 units with different addresses.
+    Transactions of the units are serialized with a FairScheduler, keeping only the
+    3.5 character silent interval required by Modbus RTU between frames.
+    '''
+    def __init__(self, port, baudrate=4800, parity='N', stopbits=1, timeout=1.0, gap=None):
+        import serial
+        import modbus_tk.modbus_rtu as modbus_rtu
+        self.port = port
+        self._master = modbus_rtu.RtuMaster(
+            serial.Serial(port=port, baudrate=baudrate, bytesize=8, parity=parity, stopbits=stopbits)
+        )
+        # RtuMaster defaults to the 3.5 character inter-frame time as response timeout
+        self._master.set_timeout(timeout)
+        if gap is None:
+            # Fixed 1.75 ms silent interval above 19200 baud, as recommended by the Modbus specification
+            gap = 3.5 * 11 / baudrate if baudrate <= 19200 else 0.00175
+        self.gap = gap
+        self._scheduler = FairScheduler()
+        self._last_frame = 0
+
+    def device(self, unit):
+        ''' Returns a PAC3100 handle for the device with given address. '''
+        return PAC3100(_BusMaster(self), unit=unit)
+
+    def execute(self, unit, *args, **kwargs):
+        kwargs['threadsafe'] = False
+        self._scheduler.acquire(unit)
+        try:
+            delay = self._last_frame + self.gap - monotonic()
+            if delay > 0:
+                sleep(delay)
+            return self._master.execute(unit, *args, **kwargs)
+        finally:
+            self._last_frame = monotonic()
+            self._scheduler.release()
+
+    def set_timeout(self, timeout_in_sec):
+        self._master.set_timeout(timeout_in_sec)
+
+    def close(self):
+        self._master.close()
@@ -0,0 +1,170 @@
+'''
+Capture of raw registers read by PACs, for reprocessing them offline:
+
+    capture = CaptureWriter('meters.cap')
+    pac.capture = capture
+    pac.read()
+
+A ReplayMaster serves the captured registers to a PAC in place of a device:
+
+    pac = PAC()
+    pac._master, pac._unit = ReplayMaster('meters.cap', device='192.168.0.80:502/1'), 1
+    try:
+        while True:
+            pac.read()
+    except EOFError:
+        pass
+'''
+from __future__ import unicode_literals, print_function, division
+import io
+from collections import namedtuple
+from struct import Struct
+from threading import Lock
+from time import sleep, time
+
+from modbus_tk.defines import READ_INPUT_REGISTERS, WRITE_MULTIPLE_REGISTERS
+
+from siemens.registers import from_bytes
+from siemens.timing import monotonic
+
+MAGIC = b'PACCAP\x00\x00'
+VERSION = 1
+HEADER = Struct(str('<8sH'))
+
+# Kind of each record, followed by the name of a device or registers of a frame
+_DEVICE, _FRAME = 0, 1
+_KIND = Struct(str('<B'))
+# Device index and name length
+DEVICE = Struct(str('<HB'))
+# Timestamp, device index, unit, start register and count
+FRAME = Struct(str('<dHBHB'))
+
+Frame = namedtuple('Frame', ['timestamp', 'device', 'unit', 'start', 'registers'])
+
+
+class CaptureWriter(object):
+    '''
+    Writes registers read by PACs to a binary capture, enabled by setting PAC.capture.
+    Each device name is stored once, frames refer to it by index. Can be shared by several PACs.
+    '''
+    def __init__(self, path):
+        self._file = io.open(path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, VERSION))
+        self._devices = {}
+        self._lock = Lock()
+
+    def record(self, device, unit, start, registers, timestamp=None):
+        ''' Writes registers, as uint16 values or raw bytes, read from a device at given time defaulting to current time. '''
+        if timestamp is None:
+            timestamp = time()
+        if isinstance(registers, (bytes, bytearray, memoryview)):
+            registers = from_bytes(registers)
+        device = '' if device is None else device
+        with self._lock:
+            index = self._devices.get(device)
+            if index is None:
+                index = self._devices[device] = len(self._devices)
+                name = device.encode('utf-8')
+                self._file.write(_KIND.pack(_DEVICE) + DEVICE.pack(index, len(name)) + name)
+            self._file.write(
+                _KIND.pack(_FRAME) + FRAME.pack(timestamp, index, unit, start, len(registers)) +
+                Struct(str('<%dH' % len(registers))).pack(*registers)
+            )
+
+    def flush(self):
+        with self._lock:
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _read_exactly(f, length):
+    data = f.read(length)
+    if len(data) < length:
+        raise EOFError('Capture ends in the middle of a record.')
+    return data
+
+
+def read_capture(path):
+    ''' Generator yielding Frames of a capture. A record cut short, e.g. by a crash, ends the capture. '''
+    with io.open(path, 'rb') as f:
+        magic, version = HEADER.unpack(_read_exactly(f, HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('%s is not a compatible capture.' % path)
+
+        devices = {}
+        while True:
+            kind = f.read(_KIND.size)
+            if not kind:
+                return
+            try:
+                if _KIND.unpack(kind)[0] == _DEVICE:
+                    index, length = DEVICE.unpack(_read_exactly(f, DEVICE.size))
+                    devices[index] = _read_exactly(f, length).decode('utf-8')
+                    continue
+                timestamp, index, unit, start, count = FRAME.unpack(_read_exactly(f, FRAME.size))
+                registers = Struct(str('<%dH' % count)).unpack(_read_exactly(f, 2 * count))
+            except EOFError:
+                return
+            yield Frame(timestamp, devices[index], unit, start, registers)
+
+
+class ReplayMaster(object):
+    '''
+    Serves registers of a capture in place of a Modbus master, in the order they were captured.
+    Only frames of given device name are replayed, or all frames if device is None.
+
+    Frames are served as fast as requested, or, if speed is given, at their original timing
+    divided by speed. Reading past the end of the capture raises EOFError.
+    Writes are accepted, but have no effect. PACs take the time of the frame last served,
+    ReplayMaster.timestamp, as the time of their update in PAC.timestamps.
+    '''
+    def __init__(self, path, device=None, speed=None):
+        self.speed = speed
+        # Timestamp of the last frame served
+        self.timestamp = None
+        self._capture = read_capture(path)
+        self._frames = (frame for frame in self._capture if device is None or frame.device == device)
+        self._origin = None
+
+    def _wait(self, timestamp):
+        if self._origin is None:
+            self._origin = (timestamp, monotonic())
+            return
+        delay = (timestamp - self._origin[0]) / self.speed - (monotonic() - self._origin[1])
+        if delay > 0:
+            sleep(delay)
+
+    def execute(self, unit, function_code, starting_address, quantity_of_x=0, output_value=None, **kwargs):
+        if function_code == WRITE_MULTIPLE_REGISTERS:
+            return starting_address, len(output_value)
+        if function_code != READ_INPUT_REGISTERS:
+            raise ValueError('Function code %d can\'t be replayed.' % function_code)
+
+        frame = next(self._frames, None)
+        if frame is None:
+            raise EOFError('End of capture.')
+        offset = starting_address - frame.start
+        if offset < 0 or offset + quantity_of_x > len(frame.registers):
+            raise ValueError('Capture has registers %d-%d, but %d-%d were read.' % (
+                frame.start, frame.start + len(frame.registers) - 1,
+                starting_address, starting_address + quantity_of_x - 1))
+
+        if self.speed is not None:
+            self._wait(frame.timestamp)
+        self.timestamp = frame.timestamp
+        return frame.registers[offset:offset + quantity_of_x]
+
+    def set_timeout(self, timeout_in_sec):
+        pass
+
+    def close(self):
+        self._capture.close()
@@ -0,0 +1,73 @@
+from __future__ import unicode_literals, print_function, division
+from math import isnan
+
+from siemens.pac import PAC
+from siemens.timing import monotonic
+
+
+class DeadbandFilter(object):
+    '''
+    Change detection for publishing PAC values.
+    Keeps the last published value of each field and returns only fields that moved beyond
+    their deadband, as a diff shaped like PAC.as_dict().
+
+    Default deadband is max(absolute, relative * abs(last published value)),
+    deadbands can be overridden per field of PAC.FIELDS with {name: (absolute, relative)}.
+    Every refresh seconds all fields are published, regardless of changes.
+    '''
+    def __init__(self, pac, absolute=0, relative=0, deadbands=None, refresh=None, replace_nan=False):
+        self.pac = pac
+        self.refresh = refresh
+        self.replace_nan = replace_nan
+        deadbands = deadbands or {}
+        self._deadbands = [deadbands.get(name, (absolute, relative)) for name in PAC.FIELDS]
+        # Top-level fields, like frequency, are plain numbers in PAC.as_dict()
+        self._units = [unit if '.' in name else None for name, unit in zip(PAC.FIELDS, PAC.UNITS)]
+        self._published = [None] * len(PAC.FIELDS)
+        self._refreshed = None
+
+    def _changed(self, i, value):
+        last = self._published[i]
+        if last is None:
+            return True
+        if isnan(value) or isnan(last):
+            return isnan(value) != isnan(last)
+        absolute, relative = self._deadbands[i]
+        return abs(value - last) > max(absolute, relative * abs(last))
+
+    def _leaf(self, i, value):
+        if self.replace_nan and isnan(value):
+            value = 0
+        if self._units[i] is None:
+            return value
+        return {'unit': self._units[i], 'value': value}
+
+    def update(self):
+        '''
+        Returns diff of current PAC values against the last published ones, and marks them published.
+        Call after reading the PAC. Empty dict means nothing changed.
+        '''
+        now = monotonic()
+        full = self.refresh is not None and (self._refreshed is None or now - self._refreshed >= self.refresh)
+        if full:
+            self._refreshed = now
+
+        diff = {}
+        for i, value in enumerate(self.pac.values()):
+            if not full and not self._changed(i, value):
+                continue
+            self._published[i] = value
+            keys = PAC.FIELDS[i].split('.')
+            node = diff
+            for key in keys[:-1]:
+                node = node.setdefault(key, {})
+            node[keys[-1]] = self._leaf(i, value)
+
+        # Tariffs are a list in PAC.as_dict(), unchanged tariffs are left empty
+        if 'tariffs' in diff:
+            diff['tariffs'] = [diff['tariffs'].get('0', {}), diff['tariffs'].get('1', {})]
+        return diff
+
+    def reset(self):
+        ''' Forgets published values, so that the next update() returns all fields. '''
+        self._published = [None] * len(PAC.FIELDS)
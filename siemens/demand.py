@@ -0,0 +1,163 @@
+from __future__ import unicode_literals, print_function, division
+from collections import namedtuple
+from math import floor, isnan
+from time import time
+
+from siemens.electricity import Energy, Power, Tariff
+
+
+def _zero():
+    return Tariff(Energy(0.0, 0.0, 0.0), Energy(0.0, 0.0, 0.0))
+
+
+def _counters(tariff):
+    return [
+        getattr(energy, name)
+        for energy in (tariff.energy_import, tariff.energy_export)
+        for name in ('apparent', 'active', 'reactive')
+    ]
+
+
+class Interval(namedtuple('Interval', ['start', 'end', 'tariffs', 'covered', 'resets', 'rollbacks', 'ignored'])):
+    '''
+    Energy imported and exported during an interval, as a Tariff for each meter tariff.
+    Covered is the number of seconds of the interval known from the counters,
+    resets and rollbacks are the numbers of counter resets and rollbacks detected in it,
+    and ignored the number of readings older than the previous one, e.g. after the clock was set back.
+    '''
+    __slots__ = ()
+
+    @property
+    def consumption(self):
+        ''' Tariff of energy summed over all tariffs. '''
+        total = _zero()
+        for tariff in self.tariffs:
+            total += tariff
+        return total
+
+    @property
+    def demand(self):
+        ''' Average [import Power, export Power] over the covered part of the interval. '''
+        if not self.covered:
+            return [Power(), Power()]
+        return self.consumption / self.covered
+
+
+class DemandTracker(object):
+    '''
+    Energy consumption per interval, e.g. 15-minute demand, from the energy counters of tariffs:
+
+        tracker = DemandTracker(900)
+        while True:
+            pac.read_energy()
+            for interval in tracker.update_pac(pac):
+                print(interval.start, interval.demand)
+
+    Counters may be read rarely, energy between two readings is divided between the intervals they span
+    assuming constant power. Intervals are aligned to multiples of their length and returned
+    as soon as a reading at or after their end arrives.
+
+    Counters of a tariff decreasing without any of them increasing is taken as a reset, e.g. by clear_tariff(),
+    energy since the reset being the new counter values. Other decreases are taken as rollbacks,
+    and energy between those readings is left out. Readings with NaN counters are ignored.
+
+    A reading at the time of the previous one, such as energy served from the cache of a PAC, has no effect.
+    Readings older than the previous one are ignored, and counted in Interval.ignored.
+    '''
+    def __init__(self, interval=900):
+        self.interval = interval
+        self._previous = None
+        self._start = None
+        self._tariffs = None
+        self._covered = 0
+        self._resets = 0
+        self._rollbacks = 0
+        self._ignored = 0
+
+    def _open(self, start):
+        self._start = start
+        self._tariffs = None
+        self._covered = 0
+        self._resets = 0
+        self._rollbacks = 0
+        self._ignored = 0
+
+    def _close(self):
+        tariffs = self._tariffs or [_zero() for _ in self._previous[1]]
+        return Interval(
+            self._start, self._start + self.interval, tariffs, self._covered, self._resets, self._rollbacks, self._ignored)
+
+    @staticmethod
+    def _delta(previous, current):
+        ''' Returns (energy between counter readings or None on a rollback, number of resets). '''
+        resets = 0
+        deltas = []
+        for before, after in zip(previous, current):
+            delta = after - before
+            counters = _counters(delta)
+            if any(value < 0 for value in counters):
+                if any(value > 0 for value in counters):
+                    return None, 0
+                resets += 1
+                delta = after
+            deltas.append(delta)
+        return deltas, resets
+
+    def update(self, timestamp, tariffs):
+        ''' Adds counter readings of tariffs at given time. Returns Intervals closed by them. '''
+        tariffs = list(tariffs)
+        if any(isnan(value) for tariff in tariffs for value in _counters(tariff)):
+            return []
+        if self._previous is None:
+            self._previous = (timestamp, tariffs)
+            self._open(floor(timestamp / self.interval) * self.interval)
+            return []
+
+        since, previous = self._previous
+        if timestamp <= since:
+            if timestamp < since:
+                self._ignored += 1
+            return []
+        if len(tariffs) != len(previous):
+            raise ValueError('Number of tariffs changed.')
+
+        # Powers of tariffs between the readings
+        deltas, resets = self._delta(previous, tariffs)
+        rates = None if deltas is None else [delta / (timestamp - since) for delta in deltas]
+
+        finished = []
+        position = since
+        while position < timestamp:
+            end = min(timestamp, self._start + self.interval)
+            if rates is not None:
+                seconds = end - position
+                if self._tariffs is None:
+                    self._tariffs = [_zero() for _ in rates]
+                self._tariffs = [
+                    total + Tariff(power_import * seconds, power_export * seconds)
+                    for total, (power_import, power_export) in zip(self._tariffs, rates)
+                ]
+                self._covered += seconds
+            position = end
+            if position == timestamp:
+                # Resets and rollbacks are counted in the interval of the reading detecting them
+                self._resets += resets
+                self._rollbacks += 1 if deltas is None else 0
+            if end == self._start + self.interval:
+                finished.append(self._close())
+                self._open(end)
+
+        self._previous = (timestamp, tariffs)
+        return finished
+
+    def update_pac(self, pac, timestamp=None):
+        ''' Adds tariffs of a PAC, at the time energy was read if timestamp isn't given. '''
+        if timestamp is None:
+            timestamp = pac.timestamps.get('energy', time())
+        return self.update(timestamp, [pac.tariff_1, pac.tariff_2])
+
+    def current(self):
+        ''' Returns the Interval still open, covering readings so far, or None before the first reading. '''
+        if self._start is None:
+            return None
+        return self._close()
@@ -8,7 +8,18 @@ def zero_if_nan(value, replace_nan):
     return 0 if isnan(value) and replace_nan else value
 
 
+def _seconds(t):
+    ''' Returns timedelta or number as seconds. '''
+    if isinstance(t, timedelta):
+        return t.total_seconds()
+    if not isinstance(t, Number):
+        raise TypeError('division allowed only by timedelta or number')
+    return t
+
+
 class Power(object):
+    __slots__ = ('apparent', 'active', '_reactive')
+
     def __init__(self, apparent=float('nan'), active=float('nan'), reactive=float('nan')):
         self.apparent = apparent
         self.active = active
@@ -23,25 +34,17 @@ class Power(object):
     def __add__(self, other):
         if not isinstance(other, Power):
             raise TypeError('unsupported operand type(s) for +')
-        return Power(apparent=self.apparent + other.apparent, active=self.active + other.active)
+        return Power(self.apparent + other.apparent, self.active + other.active)
 
     def __sub__(self, other):
         if not isinstance(other, Power):
             raise TypeError('unsupported operand type(s) for -')
-        return Power(apparent=self.apparent - other.apparent, active=self.active - other.active)
+        return Power(self.apparent - other.apparent, self.active - other.active)
 
     def __mul__(self, t):
         ''' Multiplies Power with timedelta or seconds, to allow easy calculation of average Energy. '''
-        if not isinstance(t, timedelta) and not isinstance(t, Number):
-            raise TypeError('division allowed only by timedelta or number')
-        if isinstance(t, timedelta):
-            t = t.total_seconds()
-
-        return Energy(
-            apparent=self.apparent / 3600 * abs(t),
-            active=self.active / 3600 * abs(t),
-            reactive=self.reactive / 3600 * abs(t),
-        )
+        t = abs(_seconds(t))
+        return Energy(self.apparent / 3600 * t, self.active / 3600 * t, self.reactive / 3600 * t)
 
     @property
     def reactive(self):
@@ -71,6 +74,8 @@ class Power(object):
 
 
 class Energy(object):
+    __slots__ = ('apparent', 'active', 'reactive')
+
     def __init__(self, apparent=float('nan'), active=float('nan'), reactive=float('nan')):
         self.apparent = apparent
         self.active = active
@@ -85,31 +90,17 @@ class Energy(object):
     def __add__(self, other):
         if not isinstance(other, Energy):
             raise TypeError('unsupported operand type(s) for +')
-        return Energy(
-            apparent=self.apparent + other.apparent,
-            active=self.active + other.active,
-            reactive=self.reactive + other.reactive)
+        return Energy(self.apparent + other.apparent, self.active + other.active, self.reactive + other.reactive)
 
     def __sub__(self, other):
         if not isinstance(other, Energy):
             raise TypeError('unsupported operand type(s) for -')
-        return Energy(
-            apparent=self.apparent - other.apparent,
-            active=self.active - other.active,
-            reactive=self.reactive - other.reactive)
+        return Energy(self.apparent - other.apparent, self.active - other.active, self.reactive - other.reactive)
 
     def __div__(self, t):
         ''' Divides Energy with timedelta or seconds, to allow easy calculation of average Power. '''
-        if not isinstance(t, timedelta) and not isinstance(t, Number):
-            raise TypeError('division allowed only by timedelta or number')
-        if isinstance(t, timedelta):
-            t = t.total_seconds()
-
-        return Power(
-            apparent=self.apparent / abs(t) * 3600,
-            active=self.active / abs(t) * 3600,
-            reactive=self.reactive / abs(t) * 3600,
-        )
+        t = abs(_seconds(t))
+        return Power(self.apparent / t * 3600, self.active / t * 3600, self.reactive / t * 3600)
 
     def __truediv__(self, t):
         ''' Divides Energy with timedelta or seconds, to allow easy calculation of average Power. '''
@@ -133,6 +124,8 @@ class Energy(object):
 
 
 class Tariff(object):
+    __slots__ = ('energy_import', 'energy_export')
+
     def __init__(self, energy_import=Energy(), energy_export=Energy()):
         self.energy_import = energy_import
         self.energy_export = energy_export
@@ -146,24 +139,16 @@ class Tariff(object):
     def __add__(self, other):
         if not isinstance(other, Tariff):
             raise TypeError('unsupported operand type(s) for +')
-        return Tariff(
-            energy_import=self.energy_import + other.energy_import,
-            energy_export=self.energy_export + other.energy_export)
+        return Tariff(self.energy_import + other.energy_import, self.energy_export + other.energy_export)
 
     def __sub__(self, other):
         if not isinstance(other, Tariff):
             raise TypeError('unsupported operand type(s) for -')
-        return Tariff(
-            energy_import=self.energy_import - other.energy_import,
-            energy_export=self.energy_export - other.energy_export)
+        return Tariff(self.energy_import - other.energy_import, self.energy_export - other.energy_export)
 
     def __div__(self, t):
         ''' Divides Tariff with timedelta or seconds, to allow easy calculation of average import and export Powers. '''
-        if not isinstance(t, timedelta) and not isinstance(t, Number):
-            raise TypeError('division allowed only by timedelta or number')
-        if isinstance(t, timedelta):
-            t = t.total_seconds()
-
+        t = _seconds(t)
         return [self.energy_import / t, self.energy_export / t]
 
     def __truediv__(self, t):
@@ -182,6 +167,8 @@ class Tariff(object):
 
 
 class Phase(object):
+    __slots__ = ('voltage', 'current', 'power')
+
     def __init__(self, voltage=float('nan'), current=float('nan'), apparent=float('nan'), active=float('nan')):
         self.voltage = voltage
         self.current = current
@@ -229,3 +216,44 @@ class Phase(object):
                 'value': zero_if_nan(self.current, replace_nan),
             },
         }
+
+
+def integrate(timestamps, apparent, active, reactive=None, method='trapezoid', max_gap=None):
+    '''
+    Integrates Power samples over time to Energy in a single vectorized pass.
+    With method='rectangle' each sample is held until the next one, matching the sum of Power * timedelta.
+
+    Timestamps are given in seconds or as NumPy datetime64 values.
+    If reactive powers aren't given, or a sample is NaN, they're calculated like Power.reactive.
+    Intervals with a NaN sample, or longer than max_gap seconds, are left out of the integral.
+    Requires NumPy.
+    '''
+    import numpy
+
+    if method not in ('trapezoid', 'rectangle'):
+        raise ValueError('method must be trapezoid or rectangle')
+
+    timestamps = numpy.asarray(timestamps)
+    if timestamps.dtype.kind == 'M':
+        timestamps = (timestamps - timestamps[0]) / numpy.timedelta64(1, 's')
+    dt = numpy.abs(numpy.diff(timestamps.astype(float)))
+    valid = numpy.ones(dt.shape, dtype=bool) if max_gap is None else dt <= max_gap
+
+    apparent = numpy.asarray(apparent, dtype=float)
+    active = numpy.asarray(active, dtype=float)
+    with numpy.errstate(invalid='ignore'):
+        calculated = numpy.sqrt(apparent ** 2 - active ** 2)
+    if reactive is None:
+        reactive = calculated
+    else:
+        reactive = numpy.asarray(reactive, dtype=float)
+        reactive = numpy.where(numpy.isnan(reactive), calculated, reactive)
+
+    def integral(values):
+        if method == 'rectangle':
+            segments = values[:-1] * dt
+        else:
+            segments = (values[:-1] + values[1:]) / 2 * dt
+        return float(numpy.where(valid & ~numpy.isnan(segments), segments, 0).sum() / 3600)
+
+    return Energy(integral(apparent), integral(active), integral(reactive))
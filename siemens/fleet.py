@@ -0,0 +1,141 @@
+from __future__ import unicode_literals, print_function, division
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError, wait
+from time import time
+
+from siemens.registers import REGISTERS
+from siemens.timing import Ticker, monotonic
+
+FleetSnapshot = namedtuple('FleetSnapshot', ['timestamp', 'missed', 'results', 'errors'])
+
+
+class PACFleet(object):
+    '''
+    Polls several PAC devices concurrently on a bounded thread pool.
+
+    Devices are given either as a list (keyed by index) or a dict (keyed by name).
+    Each read gets a time budget of timeout seconds from when a worker starts it, devices which haven't
+    responded by then are reported with a TimeoutError and aren't polled again
+    until their previous read has finished.
+
+    With more devices than workers, reads not started within a cycle stay queued instead of being
+    reported, and are reported by a later cycle. Devices are queued again only after their read
+    has been reported, so every device gets its turn.
+    '''
+    def __init__(self, devices, interval=1.0, timeout=None, max_workers=8, groups=tuple(REGISTERS), replace_nan=False):
+        if not isinstance(devices, dict):
+            devices = dict(enumerate(devices))
+        self.devices = devices
+        self.interval = interval
+        self.timeout = interval if timeout is None else timeout
+        self.groups = groups
+        self.replace_nan = replace_nan
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._pending = {}
+        # Monotonic time each pending read was started by a worker
+        self._started = {}
+
+        # Limit blocking I/O of each device to its time budget, so that unreachable
+        # devices don't hold on to the pool's workers.
+        for device in devices.values():
+            if hasattr(device._master, 'set_timeout'):
+                device._master.set_timeout(self.timeout)
+
+    def _read(self, device):
+        device.read(self.groups)
+        return device.as_dict(replace_nan=self.replace_nan)
+
+    def _start(self, key, device):
+        self._started[key] = monotonic()
+        return self._read(device)
+
+    def _wait(self):
+        '''
+        Waits for reads started within timeout seconds until their own time budget runs out.
+        Reads started later are left running, and reads not started are left queued.
+        '''
+        end = monotonic() + self.timeout
+        while True:
+            now = monotonic()
+            unfinished = [(key, future) for key, future in self._pending.items() if not future.done()]
+            deadlines = []
+            for key, future in unfinished:
+                started = self._started.get(key)
+                if started is None or started >= end:
+                    deadlines.append(end)
+                else:
+                    deadlines.append(started + self.timeout)
+            remaining = max(deadlines or [now]) - now
+            if remaining <= 0:
+                return
+            wait([future for _, future in unfinished], timeout=remaining, return_when=FIRST_COMPLETED)
+
+    def poll(self, missed=0):
+        ''' Polls all devices once. Returns a FleetSnapshot of results and per-device errors. '''
+        timestamp = time()
+        for key, device in self.devices.items():
+            if key not in self._pending:
+                self._started.pop(key, None)
+                self._pending[key] = self._executor.submit(self._start, key, device)
+
+        self._wait()
+
+        results, errors = {}, {}
+        now = monotonic()
+        for key, future in list(self._pending.items()):
+            if not future.done():
+                started = self._started.get(key)
+                if started is not None and now - started >= self.timeout:
+                    errors[key] = TimeoutError('Device %s did not respond in %.3f seconds.' % (key, self.timeout))
+                # Otherwise still queued or within its time budget, reported by a later cycle
+                continue
+            del self._pending[key]
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                errors[key] = e
+
+        return FleetSnapshot(timestamp, missed, results, errors)
+
+    def _clear_tariffs(self, device, tariffs, verify):
+        batch = device.batch()
+        for tariff in tariffs:
+            batch.clear_tariff(tariff)
+        return batch.commit(verify)
+
+    def clear_tariffs(self, tariffs=(1, 2), verify=True):
+        '''
+        Clears energy counters of given tariffs on all devices concurrently, with a single WriteBatch per device.
+        Returns a FleetSnapshot of the number of transactions used by each device, and per-device errors.
+        '''
+        timestamp = time()
+        futures = dict(
+            (key, self._executor.submit(self._clear_tariffs, device, tariffs, verify))
+            for key, device in self.devices.items()
+        )
+        # Writes aren't abandoned halfway, they're limited by the timeouts of the devices
+        wait(list(futures.values()))
+
+        results, errors = {}, {}
+        for key, future in futures.items():
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                errors[key] = e
+        return FleetSnapshot(timestamp, 0, results, errors)
+
+    def run(self):
+        '''
+        Generator polling all devices every interval seconds, yielding FleetSnapshots.
+        Period is kept on a monotonic schedule, cycles that couldn't be started in time
+        are skipped and reported in FleetSnapshot.missed.
+        '''
+        ticker = Ticker(self.interval)
+        while True:
+            missed = ticker.wait()
+            yield self.poll(missed)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        for device in self.devices.values():
+            device.close()
@@ -0,0 +1,132 @@
+'''
+Metrics of Modbus transactions and decoding, enabled by setting PAC.metrics:
+
+    metrics = Metrics()
+    pac.metrics = metrics
+    pac.read()
+    print(metrics.prometheus())
+'''
+from __future__ import unicode_literals, print_function, division
+from bisect import bisect_left
+from collections import namedtuple
+from threading import Lock
+
+from modbus_tk.defines import READ_INPUT_REGISTERS
+
+Transaction = namedtuple('Transaction', ['device', 'function_code', 'registers', 'bytes', 'seconds', 'retries', 'error'])
+
+# Upper bounds of the latency histogram buckets, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def pdu_bytes(function_code, registers):
+    ''' Returns (sent, received) PDU bytes of a successful transaction. '''
+    if function_code == READ_INPUT_REGISTERS:
+        return 5, 2 + 2 * registers
+    return 6 + 2 * registers, 5
+
+
+class _Histogram(object):
+    def __init__(self, buckets):
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+
+class Metrics(object):
+    '''
+    Collects latency histograms, register and byte counts, retries and failures of Modbus transactions,
+    keyed by device name and function code, and time spent decoding and constructing objects per quantity group.
+    If callback is given, it's called with a Transaction for every transaction.
+    '''
+    def __init__(self, buckets=BUCKETS, callback=None):
+        self.buckets = tuple(buckets)
+        self.callback = callback
+        self._lock = Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._processing = {}
+
+    def _count(self, name, key, value=1):
+        key = (name, ) + key
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def transaction(self, device, function_code, registers, seconds, retries=0, error=None):
+        sent, received = pdu_bytes(function_code, registers)
+        if error is not None:
+            received = 0
+        key = (device, function_code)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(self.buckets)
+            histogram.counts[bisect_left(self.buckets, seconds)] += 1
+            histogram.sum += seconds
+            histogram.count += 1
+            self._count('registers', key, registers if error is None else 0)
+            self._count('sent_bytes', key, sent * (retries + 1))
+            self._count('received_bytes', key, received)
+            self._count('retries', key, retries)
+            self._count('failures', key, 0 if error is None else 1)
+
+        if self.callback is not None:
+            self.callback(Transaction(device, function_code, registers, sent + received, seconds, retries, error))
+
+    def processed(self, device, group, decode_seconds, construct_seconds):
+        ''' Records time spent decoding registers and constructing objects of a quantity group. '''
+        key = (device, group)
+        with self._lock:
+            totals = self._processing.get(key, (0, 0.0, 0.0))
+            self._processing[key] = (totals[0] + 1, totals[1] + decode_seconds, totals[2] + construct_seconds)
+
+    def counter(self, name, device, function_code):
+        ''' Returns value of a counter: registers, sent_bytes, received_bytes, retries or failures. '''
+        return self._counters.get((name, device, function_code), 0)
+
+    def histogram(self, device, function_code):
+        ''' Returns (bucket counts, sum, count) of transaction latencies, last bucket being +Inf. '''
+        histogram = self._histograms.get((device, function_code))
+        if histogram is None:
+            return [0] * (len(self.buckets) + 1), 0.0, 0
+        return list(histogram.counts), histogram.sum, histogram.count
+
+    def processing(self, device, group):
+        ''' Returns (count, decode seconds, construct seconds) of a quantity group. '''
+        return self._processing.get((device, group), (0, 0.0, 0.0))
+
+    def prometheus(self, prefix='pac'):
+        ''' Returns metrics in Prometheus text exposition format. '''
+        lines = []
+
+        def labels(device, **extra):
+            pairs = [('device', '' if device is None else device)] + sorted(extra.items())
+            return ','.join('%s="%s"' % (key, str(value).replace('"', '\\"')) for key, value in pairs)
+
+        with self._lock:
+            lines += [
+                '# HELP %s_transaction_seconds Latency of Modbus transactions.' % prefix,
+                '# TYPE %s_transaction_seconds histogram' % prefix,
+            ]
+            for (device, function_code), histogram in sorted(self._histograms.items(), key=str):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ('+Inf', ), histogram.counts):
+                    cumulative += count
+                    lines.append('%s_transaction_seconds_bucket{%s} %d' % (
+                        prefix, labels(device, function=function_code, le=bound), cumulative))
+                lines.append('%s_transaction_seconds_sum{%s} %r' % (
+                    prefix, labels(device, function=function_code), histogram.sum))
+                lines.append('%s_transaction_seconds_count{%s} %d' % (
+                    prefix, labels(device, function=function_code), histogram.count))
+
+            for name in ('registers', 'sent_bytes', 'received_bytes', 'retries', 'failures'):
+                lines.append('# TYPE %s_%s_total counter' % (prefix, name))
+                for (counter, device, function_code), value in sorted(self._counters.items(), key=str):
+                    if counter == name:
+                        lines.append('%s_%s_total{%s} %d' % (prefix, name, labels(device, function=function_code), value))
+
+            for name, index in (('decode', 1), ('construct', 2)):
+                lines.append('# TYPE %s_%s_seconds_total counter' % (prefix, name))
+                for (device, group), totals in sorted(self._processing.items(), key=str):
+                    lines.append('%s_%s_seconds_total{%s} %r' % (prefix, name, labels(device, group=group), totals[index]))
+
+        return '\n'.join(lines) + '\n'
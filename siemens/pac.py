@@ -1,14 +1,71 @@
 from __future__ import unicode_literals, print_function, division
-from struct import pack, unpack
-from modbus_tk.defines import READ_INPUT_REGISTERS, WRITE_MULTIPLE_REGISTERS
+from collections import namedtuple
+from threading import Condition, Lock
+from time import time
+from modbus_tk.defines import READ_INPUT_REGISTERS
 
+from siemens.batch import WriteBatch
 from siemens.electricity import Power, Phase, Energy, Tariff, zero_if_nan
+from siemens.registers import REGISTERS, TYPECODES, MAX_READ_COUNT, MAX_READ_GAP, plan_reads, split_block, decode
+from siemens.timing import Ticker, clock, monotonic
+
+# Values read by PAC.stream(), in the order of PAC.FIELDS
+Sample = namedtuple('Sample', ['timestamp', 'tick', 'missed', 'values'])
+
+_NEVER = float('-inf')
+
+
+class _Flight(object):
+    ''' Read of quantity groups in progress, waited for by other callers while PAC.cache_ttl is set. '''
+    __slots__ = ('done', 'error', 'event')
+
+    def __init__(self, event=None):
+        self.done = False
+        self.error = None
+        # asyncio.Event of AsyncPAC
+        self.event = event
+
+
+def _fields():
+    power = (('apparent', 'VA'), ('active', 'W'), ('reactive', 'VAR'))
+    energy = (('apparent', 'VAh'), ('active', 'Wh'), ('reactive', 'VARh'))
+    fields = [('power.' + x, unit) for x, unit in power]
+    for phase in ('L1', 'L2', 'L3'):
+        fields += [('phases.%s.power.%s' % (phase, x), unit) for x, unit in power]
+        fields += [('phases.%s.voltage' % phase, 'V'), ('phases.%s.current' % phase, 'A')]
+    for tariff in ('energy', 'tariffs.0', 'tariffs.1'):
+        fields += [('%s.%s.%s' % (tariff, direction, x), unit) for direction in ('import', 'export') for x, unit in energy]
+    fields += [('balance.' + x, unit) for x, unit in energy]
+    fields.append(('frequency', 'Hz'))
+    return tuple(zip(*fields))
 
 
 class PAC(object):
+    # Flat names and units of the values in PAC.as_dict(), in the order returned by PAC.values()
+    FIELDS, UNITS = _fields()
+
     _master = None
     _unit = None
 
+    # Limits used when merging register ranges in PAC.read()
+    max_read_count = MAX_READ_COUNT
+    max_read_gap = MAX_READ_GAP
+
+    # Extra keyword arguments passed to master.execute()
+    _execute_kwargs = {}
+
+    # Number of times a transaction is retried after a communication error
+    retries = 0
+    # siemens.metrics.Metrics collecting metrics of transactions, disabled if None
+    metrics = None
+    # Name of the device in metrics and captures
+    name = None
+    # siemens.capture.CaptureWriter recording registers read, disabled if None
+    capture = None
+    # Seconds for which values read are reused by PAC.read() and PAC.read_*(), disabled if None.
+    # Callers needing a group while it's being read wait for that read instead of issuing their own.
+    cache_ttl = None
+
     def __init__(self):
         self.power = Power()
         self.L1 = Phase()
@@ -17,41 +74,109 @@ class PAC(object):
         self.tariff_1 = Tariff()
         self.tariff_2 = Tariff()
         self.frequency = float('nan')
+        # Number of Modbus transactions used by the last PAC.read()
+        self.transactions = 0
+        # Time of the last update of each quantity group, or the time it was captured when replayed
+        self.timestamps = {}
+        self._plans = {}
+        self._lock = Lock()
+        # Monotonic start times of the last reads, and reads in progress, of quantity groups
+        self._fresh = {}
+        self._flights = {}
+        self._flights_changed = Condition()
 
     def _from_float(self, values):
-        return [unpack(str('>f'), pack(str('>HH'), *values[i:i + 2]))[0] for i in range(0, len(values), 2)]
+        return decode(values, 'f')
 
     def _from_double(self, values):
-        return [unpack(str('>d'), pack(str('>HHHH'), *values[i:i + 4]))[0] for i in range(0, len(values), 4)]
+        return decode(values, 'd')
 
-    def read_input_register(self, register_start, count=1):
+    def _record(self, start, attempt, error, function_code, starting_address, count=0, output_value=None, **kwargs):
+        registers = count if output_value is None else len(output_value)
+        self.metrics.transaction(self.name, function_code, registers, clock() - start, attempt, error)
+
+    def _execute(self, *args, **kwargs):
         if self._master is None or self._unit is None:
             raise ValueError('Connection uninitialized.')
 
-        result = self._master.execute(self._unit, READ_INPUT_REGISTERS, register_start, count)
+        kwargs.update(self._execute_kwargs)
+        start = clock()
+        attempt = 0
+        while True:
+            try:
+                with self._lock:
+                    result = self._master.execute(self._unit, *args, **kwargs)
+                break
+            except (IOError, OSError) as e:
+                if attempt >= self.retries:
+                    if self.metrics is not None:
+                        self._record(start, attempt, e, *args, **kwargs)
+                    raise
+                attempt += 1
+
+        if self.metrics is not None:
+            self._record(start, attempt, None, *args, **kwargs)
+        return result
 
+    def _execute_all(self, requests):
+        '''
+        Executes requests, given as positional arguments of master.execute(). With a master having submit(),
+        such as siemens.pipeline.PipelinedTcpMaster, all requests are sent before waiting for the responses.
+        Failed requests are then retried one at a time.
+        '''
+        if len(requests) < 2 or not hasattr(self._master, 'submit'):
+            return [self._execute(*args) for args in requests]
+        if self._unit is None:
+            raise ValueError('Connection uninitialized.')
+
+        start = clock()
+        transactions = [self._master.submit(self._unit, *args, **self._execute_kwargs) for args in requests]
+        results = []
+        for args, transaction in zip(requests, transactions):
+            try:
+                result = transaction.result()
+            except (IOError, OSError) as e:
+                if not self.retries:
+                    if self.metrics is not None:
+                        self._record(start, 0, e, *args)
+                    raise
+                result = self._execute(*args)
+            else:
+                if self.metrics is not None:
+                    self._record(start, 0, None, *args)
+            results.append(result)
+        return results
+
+    def _timestamp(self):
+        ''' Returns time of the registers last read: capture time of frames served by a ReplayMaster, else current time. '''
+        timestamp = getattr(self._master, 'timestamp', None)
+        return time() if timestamp is None else timestamp
+
+    def _registers(self, register_start, result):
         if not result:
             raise IOError('Register read failed.')
 
+        if self.capture is not None:
+            self.capture.record(self.name, self._unit, register_start, result, self._timestamp())
         return result
 
-    def read_power(self):
-        self.power = Power(*self._from_float(self.read_input_register(63, 4)))
+    def read_input_register(self, register_start, count=1):
+        return self._registers(register_start, self._execute(READ_INPUT_REGISTERS, register_start, count))
 
-    def read_phases(self):
-        values = self._from_float(self.read_input_register(1, 30))
+    def _update_power(self, values):
+        self.power = Power(*values)
 
+    def _update_phases(self, values):
         # Note: PAC reports phase powers as NaN, if all phases aren't connected.
         #       However, the total power read with PAC.read_power() is seems valid even then.
         self.L1 = Phase(values[0], values[6], values[9], values[12])
         self.L2 = Phase(values[1], values[7], values[10], values[13])
         self.L3 = Phase(values[2], values[8], values[11], values[14])
 
-    def read_frequency(self):
-        self.frequency = self._from_float(self.read_input_register(55, 2))[0]
+    def _update_frequency(self, values):
+        self.frequency = values[0]
 
-    def read_energy(self):
-        values = self._from_double(self.read_input_register(801, 40))
+    def _update_energy(self, values):
         self.tariff_1 = Tariff(
             Energy(values[8], values[0], values[4]),
             Energy(values[8], values[2], values[6])
@@ -61,26 +186,157 @@ class PAC(object):
             Energy(values[9], values[3], values[7])
         )
 
-    def read(self):
-        self.read_power()
-        self.read_phases()
-        self.read_frequency()
-        self.read_energy()
+    def _update_block(self, block, registers):
+        metrics = self.metrics
+        timestamp = self._timestamp()
+        for group, values in split_block(block, registers):
+            self.timestamps[group] = timestamp
+            update = getattr(self, '_update_' + group)
+            if metrics is None:
+                update(decode(values, TYPECODES[group]))
+                continue
+
+            start = clock()
+            values = decode(values, TYPECODES[group])
+            decoded = clock()
+            update(values)
+            metrics.processed(self.name, group, decoded - start, clock() - decoded)
+
+    def _read_blocks(self, groups):
+        ''' Reads given quantity groups, returning number of transactions used. '''
+        plan = self._plan(groups)
+        results = self._execute_all([(READ_INPUT_REGISTERS, block.start, block.count) for block in plan])
+        for block, result in zip(plan, results):
+            self._update_block(block, self._registers(block.start, result))
+        return len(plan)
+
+    def _pending(self, groups):
+        ''' Returns (groups not read within PAC.cache_ttl, a _Flight reading some of them or None). '''
+        now = monotonic()
+        stale = [group for group in groups if now - self._fresh.get(group, _NEVER) >= self.cache_ttl]
+        flights = [self._flights[group] for group in stale if group in self._flights]
+        return stale, flights[0] if flights else None
+
+    def _claim(self, groups, flight):
+        for group in groups:
+            self._flights[group] = flight
+
+    def _finish(self, groups, flight, started, error):
+        flight.done = True
+        flight.error = error
+        for group in groups:
+            # Groups expired during the read aren't claimed by it anymore
+            if self._flights.get(group) is flight:
+                del self._flights[group]
+                if error is None:
+                    self._fresh[group] = started
+
+    def _expire(self, groups):
+        ''' Drops cached values of given groups, so they're read again even if a read is in progress. '''
+        with self._flights_changed:
+            for group in groups:
+                self._fresh.pop(group, None)
+                self._flights.pop(group, None)
+
+    def _read_cached(self, groups):
+        ''' Reads given quantity groups not read within PAC.cache_ttl, returning number of transactions used. '''
+        if self.cache_ttl is None:
+            return self._read_blocks(groups)
+
+        with self._flights_changed:
+            while True:
+                stale, flight = self._pending(groups)
+                if flight is None:
+                    break
+                while not flight.done:
+                    self._flights_changed.wait()
+                if flight.error is not None:
+                    raise flight.error
+            if not stale:
+                return 0
+            flight = _Flight()
+            self._claim(stale, flight)
+
+        started = monotonic()
+        # Seen by waiters if the read is interrupted, e.g. cancelled
+        error = IOError('Read was interrupted.')
+        try:
+            transactions = self._read_blocks(stale)
+            error = None
+            return transactions
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            with self._flights_changed:
+                self._finish(stale, flight, started, error)
+                self._flights_changed.notify_all()
+
+    def _read_group(self, group):
+        self._read_cached((group, ))
 
-    def clear_tariff(self, tariff):
-        if self._master is None or self._unit is None:
-            raise ValueError('Connection uninitialized.')
+    def read_power(self):
+        self._read_group('power')
 
+    def read_phases(self):
+        self._read_group('phases')
+
+    def read_frequency(self):
+        self._read_group('frequency')
+
+    def read_energy(self):
+        self._read_group('energy')
+
+    def _plan(self, groups):
+        key = tuple(groups)
+        plan = self._plans.get(key)
+        if plan is None:
+            plan = self._plans[key] = plan_reads(key, self.max_read_count, self.max_read_gap)
+        return plan
+
+    def read(self, groups=tuple(REGISTERS)):
+        '''
+        Reads given quantity groups ('power', 'phases', 'frequency', 'energy'), defaulting to all.
+        Register ranges are merged into as few block reads as possible,
+        number of transactions used is stored in PAC.transactions.
+        If PAC.cache_ttl is set, only groups not read within it are read.
+        '''
+        self.transactions = self._read_cached(groups)
+
+    def stream(self, interval, groups=tuple(REGISTERS)):
+        '''
+        Generator reading given quantity groups every interval seconds, yielding Samples.
+        Reads are scheduled on monotonic time, so the period doesn't drift by the duration of the reads.
+        Ticks that couldn't be read in time are skipped and counted in Sample.missed.
+        '''
+        ticker = Ticker(interval)
+        while True:
+            missed = ticker.wait()
+            timestamp = time()
+            self.read(groups)
+            yield Sample(timestamp, ticker.tick, missed, self.values())
+
+    def _tariff_registers(self, tariff):
+        ''' Returns start registers of the energy counters of given tariff. '''
         if tariff == 1:
             start = 801
         if tariff == 2:
             start = 805
-        registers = range(start, start + 5 * 8, 8)
-        for x in registers:
-            self._master.execute(self._unit, WRITE_MULTIPLE_REGISTERS, x, output_value=[0, 0, 0, 0])
-        # Read energy to update values...
-        self.read_energy()
-        
+        return range(start, start + 5 * 8, 8)
+
+    def batch(self):
+        ''' Returns a siemens.batch.WriteBatch queueing register writes to this PAC. '''
+        return WriteBatch(self)
+
+    def clear_tariff(self, tariff):
+        '''
+        Clears energy counters of tariff 1 or 2, verifying them by reading energy back.
+        To clear both tariffs in a single transaction, use PAC.batch().
+        '''
+        batch = self.batch()
+        batch.clear_tariff(tariff)
+        batch.commit()
+
     def close(self):
         if self._master is None or self._unit is None:
             return
@@ -94,6 +350,30 @@ class PAC(object):
     def energy_balance(self):
         return self.tariff_1.energy_import + self.tariff_2.energy_import - self.tariff_1.energy_export - self.tariff_2.energy_export
 
+    def values(self):
+        ''' Returns values of PAC.as_dict() as a flat tuple, in the order of PAC.FIELDS. '''
+        values = [self.power.apparent, self.power.active, self.power.reactive]
+        for phase in (self.L1, self.L2, self.L3):
+            power = phase.power
+            values += (power.apparent, power.active, power.reactive, phase.voltage, phase.current)
+        for tariff in (self.energy, self.tariff_1, self.tariff_2):
+            for energy in (tariff.energy_import, tariff.energy_export):
+                values += (energy.apparent, energy.active, energy.reactive)
+        balance = self.energy_balance
+        values += (balance.apparent, balance.active, balance.reactive, self.frequency)
+        return tuple(values)
+
+    def as_flat(self, replace_nan=False):
+        ''' Returns values of PAC.as_dict() as a flat dictionary keyed by PAC.FIELDS, without units. '''
+        values = self.values()
+        if replace_nan:
+            values = [0 if value != value else value for value in values]
+        return dict(zip(self.FIELDS, values))
+
+    def to_record(self, timestamp=None):
+        ''' Returns a record of current values, with the fields of siemens.record.SCHEMA. '''
+        return (time() if timestamp is None else timestamp, ) + self.values()
+
     def as_dict(self, replace_nan=False):
         return {
             'power': self.power.as_dict(replace_nan=replace_nan),
@@ -115,15 +395,27 @@ class PAC(object):
 class PAC3100(PAC):
     '''
     Class for connecting to PAC3100 through Modbus RTU.
+    Several units on the same RS-485 line can share a port through siemens.bus.RtuBus.
     Note: Untested.
     '''
-    def __init__(self, port, baudrate=4800, unit=1, parity='N', stopbits=1):
+    # Each instance has its own master, so modbus_tk's process-wide lock isn't needed
+    _execute_kwargs = {'threadsafe': False}
+
+    def __init__(self, port, baudrate=4800, unit=1, parity='N', stopbits=1, timeout=1.0):
         import serial
         import modbus_tk.modbus_rtu as modbus_rtu
         self._unit = unit
-        self._master = modbus_rtu.RtuMaster(
-            serial.Serial(port=port, baudrate=baudrate, bytesize=8, parity=parity, stopbits=stopbits)
-        )
+        if hasattr(port, 'execute'):
+            # Master of a shared bus
+            self._master = port
+            port = port.port
+        else:
+            self._master = modbus_rtu.RtuMaster(
+                serial.Serial(port=port, baudrate=baudrate, bytesize=8, parity=parity, stopbits=stopbits)
+            )
+            # RtuMaster defaults to the 3.5 character inter-frame time as response timeout
+            self._master.set_timeout(timeout)
+        self.name = '%s/%d' % (port, unit)
 
         super(PAC3100, self).__init__()
 
@@ -131,12 +423,26 @@ class PAC3100(PAC):
 class PACx200(PAC):
     '''
     Class for connecting to PAC3200 and PAC4200 through Modbus TCP/IP.
+    Devices behind a Modbus TCP gateway are addressed by unit, and can share
+    persistent connections through a siemens.pool.ConnectionPool.
+    On high-latency links, pipeline sets the number of requests kept outstanding
+    by a siemens.pipeline.PipelinedTcpMaster.
     '''
-    def __init__(self, host, port=502):
+    # Each instance has its own master, so modbus_tk's process-wide lock isn't needed
+    _execute_kwargs = {'threadsafe': False}
+
+    def __init__(self, host, port=502, unit=1, pool=None, pipeline=None):
         import modbus_tk.modbus_tcp as modbus_tcp
 
-        self._unit = 1
-        self._master = modbus_tcp.TcpMaster(host, port)
+        self._unit = unit
+        if pool is not None:
+            self._master = pool.get(host, port)
+        elif pipeline is not None:
+            from siemens.pipeline import PipelinedTcpMaster
+            self._master = PipelinedTcpMaster(host, port, window=pipeline)
+        else:
+            self._master = modbus_tcp.TcpMaster(host, port)
+        self.name = '%s:%d/%d' % (host, port, unit)
 
         super(PACx200, self).__init__()
 
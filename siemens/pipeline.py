@@ -0,0 +1,213 @@
+'''
+Modbus TCP/IP master keeping several requests outstanding on one connection, matching responses
+to requests by the transaction ID of the MBAP header. PAC.read() and PAC.clear_tariff() send all
+of their requests at once through it, so they take about one round trip instead of one per request:
+
+    pac = PACx200('10.8.0.12', pipeline=4)
+'''
+from __future__ import unicode_literals, print_function, division
+import socket
+from struct import Struct, unpack_from
+from threading import Condition, Event, Thread
+
+from modbus_tk.defines import READ_INPUT_REGISTERS, WRITE_MULTIPLE_REGISTERS
+from modbus_tk.exceptions import ModbusError, ModbusInvalidResponseError
+
+from siemens.registers import from_bytes, to_bytes
+from siemens.timing import monotonic
+
+_MBAP = Struct(str('>HHHB'))
+_READ_REQUEST = Struct(str('>BHH'))
+_WRITE_REQUEST = Struct(str('>BHHB'))
+_WRITE_RESPONSE = Struct(str('>HH'))
+
+
+def _recv_exactly(sock, length):
+    data = b''
+    while len(data) < length:
+        chunk = sock.recv(length - len(data))
+        if not chunk:
+            raise IOError('Connection closed by the device.')
+        data += chunk
+    return data
+
+
+class Transaction(object):
+    ''' Request outstanding on a PipelinedTcpMaster, whose response is waited for with Transaction.result(). '''
+    __slots__ = ('transaction_id', 'function_code', 'deadline', '_master', '_event', '_response', '_error')
+
+    def __init__(self, master, transaction_id, function_code, deadline):
+        self.transaction_id = transaction_id
+        self.function_code = function_code
+        self.deadline = deadline
+        self._master = master
+        self._event = Event()
+        self._response = None
+        self._error = None
+
+    def _complete(self, pdu):
+        function_code = unpack_from(str('>B'), pdu)[0]
+        try:
+            if function_code & 0x80:
+                raise ModbusError(unpack_from(str('>B'), pdu, 1)[0])
+            if function_code != self.function_code:
+                raise ModbusInvalidResponseError('Invalid function code in response.')
+            if function_code == WRITE_MULTIPLE_REGISTERS:
+                self._response = _WRITE_RESPONSE.unpack_from(pdu, 1)
+            else:
+                if unpack_from(str('>B'), pdu, 1)[0] != len(pdu) - 2:
+                    raise ModbusInvalidResponseError('Invalid byte count in response.')
+                self._response = from_bytes(pdu[2:])
+        except Exception as e:
+            self._error = e
+        self._event.set()
+
+    def _fail(self, error):
+        self._error = error
+        self._event.set()
+
+    def result(self):
+        '''
+        Waits for the response until the deadline of the transaction. Returns registers read,
+        or (starting_address, quantity) written, like modbus_tk masters.
+        '''
+        if not self._event.wait(max(0, self.deadline - monotonic())):
+            self._master._expire(self)
+            if not self._event.is_set():
+                raise socket.timeout('No response to transaction %d.' % self.transaction_id)
+        if self._error is not None:
+            raise self._error
+        return self._response
+
+
+class PipelinedTcpMaster(object):
+    '''
+    Modbus TCP/IP master with up to window requests outstanding on a single connection,
+    for links with high latency. Can be shared by PACs of different units and threads.
+
+    A receiving thread matches responses to transactions by transaction ID, in whichever order they arrive.
+    Each transaction times out after timeout seconds, a late response to it is discarded.
+    After a connection error all outstanding transactions fail with it,
+    and a new connection is opened on the next request.
+    '''
+    def __init__(self, host, port=502, timeout=5.0, window=4):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.window = window
+        self._sock = None
+        self._transaction_id = 0
+        self._pending = {}
+        self._changed = Condition()
+
+    def _open(self):
+        if self._sock is not None:
+            return
+        sock = socket.create_connection((self.host, self.port), self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        # Responses are waited for by the receiving thread, transactions time out on their own
+        sock.settimeout(None)
+        self._sock = sock
+        receiver = Thread(target=self._receive, args=(sock, ))
+        receiver.daemon = True
+        receiver.start()
+
+    def open(self):
+        with self._changed:
+            self._open()
+
+    def _disconnect(self, error):
+        ''' Closes the connection, failing outstanding transactions with error. Called with _changed held. '''
+        if self._sock is not None:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+            self._sock.close()
+            self._sock = None
+        for transaction in self._pending.values():
+            transaction._fail(error)
+        self._pending.clear()
+        self._changed.notify_all()
+
+    def _receive(self, sock):
+        try:
+            while True:
+                transaction_id, protocol, length, _ = _MBAP.unpack(_recv_exactly(sock, _MBAP.size))
+                if protocol != 0 or length < 3:
+                    raise ModbusInvalidResponseError('Invalid MBAP header in response.')
+                pdu = _recv_exactly(sock, length - 1)
+                with self._changed:
+                    transaction = self._pending.pop(transaction_id, None)
+                    self._changed.notify_all()
+                if transaction is not None:
+                    transaction._complete(pdu)
+        except (IOError, OSError, ModbusInvalidResponseError) as e:
+            with self._changed:
+                if self._sock is sock:
+                    self._disconnect(e if isinstance(e, (IOError, OSError)) else IOError(str(e)))
+
+    def _expire(self, transaction):
+        with self._changed:
+            if self._pending.get(transaction.transaction_id) is transaction:
+                del self._pending[transaction.transaction_id]
+                self._changed.notify_all()
+
+    def _expire_overdue(self):
+        ''' Fails transactions past their deadline, whose result nobody waited for. Called with _changed held. '''
+        now = monotonic()
+        for transaction_id, transaction in list(self._pending.items()):
+            if transaction.deadline < now:
+                del self._pending[transaction_id]
+                transaction._fail(socket.timeout('No response to transaction %d.' % transaction_id))
+
+    def _next_transaction_id(self):
+        while True:
+            self._transaction_id = (self._transaction_id + 1) & 0xffff
+            if self._transaction_id not in self._pending:
+                return self._transaction_id
+
+    def submit(self, unit, function_code, starting_address, quantity_of_x=0, output_value=None, **kwargs):
+        '''
+        Sends READ_INPUT_REGISTERS or WRITE_MULTIPLE_REGISTERS without waiting for the response,
+        once less than window transactions are outstanding. Returns a Transaction.
+        '''
+        if function_code == READ_INPUT_REGISTERS:
+            pdu = _READ_REQUEST.pack(function_code, starting_address, quantity_of_x)
+        elif function_code == WRITE_MULTIPLE_REGISTERS:
+            data = to_bytes(output_value)
+            pdu = _WRITE_REQUEST.pack(function_code, starting_address, len(data) // 2, len(data)) + data
+        else:
+            raise ValueError('Unsupported function code %d.' % function_code)
+
+        deadline = monotonic() + self.timeout
+        with self._changed:
+            self._expire_overdue()
+            while len(self._pending) >= self.window:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    raise socket.timeout('No room in the window of %s:%d.' % (self.host, self.port))
+                self._changed.wait(remaining)
+                self._expire_overdue()
+
+            self._open()
+            transaction = Transaction(self, self._next_transaction_id(), function_code, deadline)
+            self._pending[transaction.transaction_id] = transaction
+            try:
+                self._sock.sendall(_MBAP.pack(transaction.transaction_id, 0, len(pdu) + 1, unit) + pdu)
+            except (IOError, OSError) as e:
+                self._disconnect(e)
+                raise
+        return transaction
+
+    def execute(self, unit, *args, **kwargs):
+        ''' Executes a single transaction, like modbus_tk masters. '''
+        return self.submit(unit, *args, **kwargs).result()
+
+    def set_timeout(self, timeout_in_sec):
+        self.timeout = timeout_in_sec
+
+    def close(self):
+        with self._changed:
+            self._disconnect(IOError('Connection closed.'))
@@ -0,0 +1,128 @@
+from __future__ import unicode_literals, print_function, division
+import socket
+from queue import Queue, Empty
+from threading import Lock
+
+import modbus_tk.modbus_tcp as modbus_tcp
+
+from siemens.timing import monotonic
+
+class _KeepaliveTcpMaster(modbus_tcp.TcpMaster):
+    ''' TcpMaster enabling TCP keepalive on every connection it opens. '''
+    def _do_open(self):
+        super(_KeepaliveTcpMaster, self)._do_open()
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if hasattr(socket, 'TCP_KEEPIDLE'):
+            self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 30)
+            self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 10)
+
+
+class GatewayConnection(object):
+    '''
+    Persistent Modbus TCP/IP connections to a device or gateway, shared by PACs of different units.
+
+    At most max_concurrent transactions are in flight at once, each on its own connection.
+    After failing to connect or a socket error the connection is reopened on the next transaction,
+    but not before a backoff delay, doubling from min_backoff up to max_backoff seconds.
+    Transactions during the backoff fail immediately. A unit not responding in time only has
+    its connection reopened, without holding up transactions of other units.
+    '''
+    def __init__(self, host, port=502, timeout=5.0, max_concurrent=1, min_backoff=0.5, max_backoff=30.0):
+        self.host = host
+        self.port = port
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self._timeout = timeout
+        self._masters = []
+        self._idle = Queue()
+        for _ in range(max_concurrent):
+            master = _KeepaliveTcpMaster(host, port, timeout)
+            self._masters.append(master)
+            self._idle.put(master)
+        self._lock = Lock()
+        self._backoff = 0
+        self._retry_at = 0
+
+    def open(self):
+        ''' Opens all connections ahead of the first transactions. '''
+        for master in self._masters:
+            master.open()
+
+    def execute(self, unit, *args, **kwargs):
+        with self._lock:
+            if monotonic() < self._retry_at:
+                raise IOError('Connection to %s:%d is backing off after an error.' % (self.host, self.port))
+
+        kwargs['threadsafe'] = False
+        try:
+            master = self._idle.get(timeout=self._timeout)
+        except Empty:
+            raise IOError('No connection to %s:%d available.' % (self.host, self.port))
+        try:
+            master.open()
+            result = master.execute(unit, *args, **kwargs)
+        except socket.timeout:
+            if not master._is_opened:
+                self._back_off(master)
+                raise
+            # A unit not responding doesn't hold up others, the connection is only reopened
+            # so that its late response isn't taken for the next transaction
+            master.close()
+            raise
+        except (IOError, OSError):
+            self._back_off(master)
+            raise
+        finally:
+            self._idle.put(master)
+
+        with self._lock:
+            self._backoff = 0
+        return result
+
+    def _back_off(self, master):
+        master.close()
+        with self._lock:
+            self._backoff = min(self.max_backoff, max(self.min_backoff, 2 * self._backoff))
+            self._retry_at = monotonic() + self._backoff
+
+    def set_timeout(self, timeout_in_sec):
+        self._timeout = timeout_in_sec
+        for master in self._masters:
+            master.set_timeout(timeout_in_sec)
+
+    def close(self):
+        ''' Connections are shared, they're closed with ConnectionPool.close(). '''
+        pass
+
+    def _disconnect(self):
+        for master in self._masters:
+            master.close()
+
+
+class ConnectionPool(object):
+    '''
+    Pool of GatewayConnections keyed by (host, port), to be shared by PACx200 instances:
+
+        pool = ConnectionPool()
+        meters = [PACx200('192.168.0.80', unit=unit, pool=pool) for unit in (1, 2, 3)]
+
+    Keyword arguments are passed to every GatewayConnection.
+    '''
+    def __init__(self, **kwargs):
+        self._kwargs = kwargs
+        self._connections = {}
+        self._lock = Lock()
+
+    def get(self, host, port=502):
+        with self._lock:
+            connection = self._connections.get((host, port))
+            if connection is None:
+                connection = self._connections[(host, port)] = GatewayConnection(host, port, **self._kwargs)
+            return connection
+
+    def close(self):
+        with self._lock:
+            for connection in self._connections.values():
+                connection._disconnect()
+            self._connections.clear()
@@ -0,0 +1,51 @@
+'''
+Flat, versioned records of PAC values, from PAC.to_record(), and their encoders.
+Units are kept in SCHEMA instead of repeating them in every record.
+'''
+from __future__ import unicode_literals, print_function, division
+import csv
+import json
+from struct import Struct
+
+from siemens.pac import PAC
+
+SCHEMA_VERSION = 1
+
+SCHEMA = {
+    'version': SCHEMA_VERSION,
+    'fields': ('timestamp', ) + PAC.FIELDS,
+    'units': ('s', ) + PAC.UNITS,
+}
+
+# Little-endian doubles, NaN values are kept as is
+RECORD = Struct(str('<%dd' % len(SCHEMA['fields'])))
+
+
+def _nan_to(record, replacement):
+    return [replacement if value != value else value for value in record]
+
+
+def to_ndjson(records):
+    '''
+    Encodes records as newline-delimited JSON arrays in the order of SCHEMA['fields'].
+    NaN values, invalid in JSON, are encoded as null.
+    '''
+    return ''.join(json.dumps(_nan_to(record, None), separators=(',', ':')) + '\n' for record in records)
+
+
+def write_csv(file, records, header=True):
+    ''' Writes records as CSV rows, optionally preceded by a header of field names. NaN values are left empty. '''
+    writer = csv.writer(file)
+    if header:
+        writer.writerow(SCHEMA['fields'])
+    writer.writerows(_nan_to(record, '') for record in records)
+
+
+def pack_record(record):
+    ''' Packs a record to RECORD.size bytes. '''
+    return RECORD.pack(*record)
+
+
+def unpack_record(data, offset=0):
+    ''' Unpacks a record packed with pack_record(). '''
+    return RECORD.unpack_from(data, offset)
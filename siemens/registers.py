@@ -0,0 +1,148 @@
+from __future__ import unicode_literals, print_function, division
+from collections import namedtuple, OrderedDict
+from struct import Struct
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Modbus limits a single READ_INPUT_REGISTERS response to 125 registers.
+MAX_READ_COUNT = 125
+
+# Unused registers allowed between two ranges before they're read separately.
+MAX_READ_GAP = 32
+
+# Modbus limits a single WRITE_MULTIPLE_REGISTERS request to 123 registers.
+MAX_WRITE_COUNT = 123
+
+# Input register ranges of each quantity group, as (start, count).
+REGISTERS = OrderedDict((
+    ('phases', (1, 30)),
+    ('frequency', (55, 2)),
+    ('power', (63, 4)),
+    ('energy', (801, 40)),
+))
+
+# Values of each quantity group are floats ('f') or doubles ('d')
+TYPECODES = {
+    'phases': 'f',
+    'frequency': 'f',
+    'power': 'f',
+    'energy': 'd',
+}
+
+ReadBlock = namedtuple('ReadBlock', ['start', 'count', 'groups'])
+
+
+def plan_reads(groups, max_count=MAX_READ_COUNT, max_gap=MAX_READ_GAP):
+    '''
+    Merges register ranges of given quantity groups into as few block reads as possible.
+    Ranges are merged if the merged block fits in max_count registers and
+    there's at most max_gap unused registers between them.
+    '''
+    ranges = sorted((REGISTERS[group][0], REGISTERS[group][1], group) for group in set(groups))
+    blocks = []
+    for start, count, group in ranges:
+        if blocks:
+            last = blocks[-1]
+            end = max(last.start + last.count, start + count)
+            if start - (last.start + last.count) <= max_gap and end - last.start <= max_count:
+                blocks[-1] = ReadBlock(last.start, end - last.start, last.groups + (group, ))
+                continue
+        blocks.append(ReadBlock(start, count, (group, )))
+    return blocks
+
+
+def merge_ranges(ranges, max_count=MAX_READ_COUNT, max_gap=MAX_READ_GAP):
+    ''' Merges (start, count) register ranges into as few (start, count) block reads as possible, like plan_reads(). '''
+    blocks = []
+    for start, count in sorted(ranges):
+        if blocks:
+            last_start, last_count = blocks[-1]
+            end = max(last_start + last_count, start + count)
+            if start - (last_start + last_count) <= max_gap and end - last_start <= max_count:
+                blocks[-1] = (last_start, end - last_start)
+                continue
+        blocks.append((start, count))
+    return blocks
+
+
+def merge_writes(registers, max_count=MAX_WRITE_COUNT):
+    '''
+    Merges writes of {register: value} into as few (start, [values]) block writes as possible.
+    Only contiguous registers are merged, as registers in between would be overwritten.
+    '''
+    blocks = []
+    for register in sorted(registers):
+        if blocks:
+            start, values = blocks[-1]
+            if start + len(values) == register and len(values) < max_count:
+                values.append(registers[register])
+                continue
+        blocks.append((register, [registers[register]]))
+    return blocks
+
+
+def split_block(block, values):
+    '''
+    Splits values read for a ReadBlock back into (group, values) pairs.
+    Raw bytes are split without copying.
+    '''
+    width = 1
+    if isinstance(values, (bytes, bytearray, memoryview)):
+        values = memoryview(values)
+        width = 2
+    for group in block.groups:
+        start, count = REGISTERS[group]
+        offset = start - block.start
+        yield group, values[offset * width:(offset + count) * width]
+
+
+_structs = {}
+_DTYPES = {'f': '>f4', 'd': '>f8'}
+
+
+def _struct(fmt):
+    compiled = _structs.get(fmt)
+    if compiled is None:
+        compiled = _structs[fmt] = Struct(str(fmt))
+    return compiled
+
+
+def to_bytes(registers):
+    ''' Packs uint16 register values to big-endian bytes, raw bytes are returned as is. '''
+    if isinstance(registers, (bytes, bytearray, memoryview)):
+        return registers
+    return _struct('>%dH' % len(registers)).pack(*registers)
+
+
+def from_bytes(data):
+    ''' Unpacks big-endian bytes to a tuple of uint16 register values. '''
+    return _struct('>%dH' % (len(data) // 2)).unpack(data)
+
+
+def decode(registers, typecode='f'):
+    '''
+    Decodes a block of big-endian floats ('f') or doubles ('d') with a single precompiled Struct.
+    Registers may be given as uint16 values or as raw bytes from the transport.
+    '''
+    data = to_bytes(registers)
+    fmt = _struct('>' + typecode)
+    return _struct('>%d%s' % (len(data) // fmt.size, typecode)).unpack(data)
+
+
+def encode(values, typecode='f'):
+    ''' Encodes floats ('f') or doubles ('d') to uint16 register values. '''
+    return from_bytes(_struct('>%d%s' % (len(values), typecode)).pack(*values))
+
+
+def decode_array(registers, typecode='f'):
+    '''
+    Returns a NumPy array of big-endian floats ('f') or doubles ('d').
+    For raw bytes the array is a zero-copy view of the buffer.
+    Requires NumPy.
+    '''
+    if numpy is None:
+        raise ImportError('decode_array() requires NumPy.')
+    return numpy.frombuffer(to_bytes(registers), dtype=_DTYPES[typecode])
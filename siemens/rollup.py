@@ -0,0 +1,123 @@
+from __future__ import unicode_literals, print_function, division
+from collections import namedtuple
+from math import floor, isnan
+from time import time
+
+from siemens.pac import PAC
+
+# Fields aggregated by default
+FIELDS = (
+    'power.active',
+    'phases.L1.voltage', 'phases.L2.voltage', 'phases.L3.voltage',
+    'phases.L1.current', 'phases.L2.current', 'phases.L3.current',
+    'frequency',
+)
+
+Stats = namedtuple('Stats', ['count', 'min', 'max', 'mean', 'last', 'time_weighted_mean'])
+Aggregate = namedtuple('Aggregate', ['window', 'start', 'stats'])
+
+_NAN = float('nan')
+
+
+class _Accumulator(object):
+    __slots__ = ('count', 'min', 'max', 'sum', 'last', 'weighted', 'duration')
+
+    def __init__(self):
+        self.count = 0
+        self.min = self.max = self.last = _NAN
+        self.sum = self.weighted = self.duration = 0.0
+
+    def stats(self):
+        return Stats(
+            self.count, self.min, self.max,
+            self.sum / self.count if self.count else _NAN,
+            self.last,
+            self.weighted / self.duration if self.duration else _NAN,
+        )
+
+
+class _Window(object):
+    def __init__(self, size, fields):
+        self.size = size
+        self.fields = fields
+        self.start = None
+        self.accumulators = None
+
+    def open(self, timestamp):
+        self.start = floor(timestamp / self.size) * self.size
+        self.accumulators = [_Accumulator() for _ in self.fields]
+
+    def close(self):
+        return Aggregate(self.size, self.start, dict(
+            (name, accumulator.stats()) for name, accumulator in zip(self.fields, self.accumulators)))
+
+
+class Rollup(object):
+    '''
+    Incremental min/max/mean/last and time-weighted mean of PAC fields over several window sizes at once,
+    updated in constant time and memory for each reading.
+
+    Windows are aligned to multiples of their size in seconds, for example
+    Rollup(windows=(60, 900)) gives 1- and 15-minute aggregates.
+    Time-weighted means hold each value until the next reading. NaN values are left out.
+    '''
+    def __init__(self, windows=(60, 900), fields=FIELDS):
+        self.fields = tuple(fields)
+        self._select = [PAC.FIELDS.index(name) for name in self.fields]
+        self._windows = [_Window(size, self.fields) for size in windows]
+        self._previous = None
+
+    def _hold(self, window, until):
+        ''' Adds the previous values to the time-weighted sums of window until given time. '''
+        if self._previous is None:
+            return
+        timestamp, values = self._previous
+        duration = until - max(timestamp, window.start)
+        if duration <= 0:
+            return
+        for accumulator, value in zip(window.accumulators, values):
+            if not isnan(value):
+                accumulator.weighted += value * duration
+                accumulator.duration += duration
+
+    def add(self, timestamp, values):
+        '''
+        Adds a reading with values in the order of Rollup.fields.
+        Returns Aggregates of the windows closed by it.
+        '''
+        finished = []
+        for window in self._windows:
+            if window.start is None:
+                window.open(timestamp)
+            elif timestamp >= window.start + window.size:
+                self._hold(window, window.start + window.size)
+                finished.append(window.close())
+                window.open(timestamp)
+
+            self._hold(window, timestamp)
+            for accumulator, value in zip(window.accumulators, values):
+                if isnan(value):
+                    continue
+                if accumulator.count:
+                    accumulator.min = min(accumulator.min, value)
+                    accumulator.max = max(accumulator.max, value)
+                else:
+                    accumulator.min = accumulator.max = value
+                accumulator.count += 1
+                accumulator.sum += value
+                accumulator.last = value
+
+        self._previous = (timestamp, values)
+        return finished
+
+    def add_pac(self, pac, timestamp=None):
+        ''' Adds current values of a PAC. Timestamp defaults to current time. '''
+        values = pac.values()
+        return self.add(time() if timestamp is None else timestamp, [values[i] for i in self._select])
+
+    def flush(self):
+        ''' Returns Aggregates of the windows still open, closing them at the time of the last reading. '''
+        finished = [window.close() for window in self._windows if window.start is not None]
+        for window in self._windows:
+            window.start = None
+        return finished
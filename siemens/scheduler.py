@@ -0,0 +1,52 @@
+from __future__ import unicode_literals, print_function, division
+from time import sleep
+
+from siemens.timing import monotonic
+
+
+class AcquisitionScheduler(object):
+    '''
+    Reads each quantity group of a PAC on its own period, for example:
+
+        AcquisitionScheduler(pac, {'power': 0.1, 'phases': 2, 'frequency': 2, 'energy': 60})
+
+    Groups falling due at the same time are read with PAC.read(), merging them into as few
+    transactions as possible. Groups due within slack seconds (half the shortest period by default)
+    are read early, to be merged with the groups already due.
+    Latest values stay on the PAC, with the time of each group's update in PAC.timestamps.
+    '''
+    def __init__(self, pac, periods, slack=None):
+        self.pac = pac
+        self.periods = dict(periods)
+        self.slack = min(self.periods.values()) / 2 if slack is None else slack
+        self._start = monotonic()
+        # Next reads are scheduled at start + k * period, so that periods don't accumulate rounding errors
+        self._ticks = dict((group, 0) for group in self.periods)
+
+    def _due(self, group):
+        return self._start + self._ticks[group] * self.periods[group]
+
+    def next_due(self):
+        ''' Returns monotonic time when the next group falls due. '''
+        return min(self._due(group) for group in self.periods)
+
+    def poll(self):
+        ''' Reads the groups which are due. Returns the groups read. '''
+        now = monotonic()
+        due = sorted(group for group in self.periods if self._due(group) <= now + self.slack)
+        if not due:
+            return []
+
+        self.pac.read(due)
+        for group in due:
+            # Missed periods are skipped instead of being read in a burst
+            self._ticks[group] = max(self._ticks[group] + 1, int((now - self._start) / self.periods[group]) + 1)
+        return due
+
+    def run(self):
+        ''' Generator reading groups as they fall due, yielding the groups read. '''
+        while True:
+            delay = self.next_due() - self.slack - monotonic()
+            if delay > 0:
+                sleep(delay)
+            yield self.poll()
@@ -0,0 +1,224 @@
+'''
+Polling of PAC devices split across worker processes, which write the latest readings
+to a table in shared memory. Readers in any process get the fleet state without pickling:
+
+    devices = dict((host, partial(PACx200, host)) for host in hosts)
+    with ShardedPoller(devices, processes=4, interval=1.0) as poller:
+        while True:
+            sleep(1)
+            for key, reading in zip(poller.keys, poller.table.snapshot()):
+                print(key, reading)
+'''
+from __future__ import unicode_literals, print_function, division
+import multiprocessing
+from collections import namedtuple
+from multiprocessing import shared_memory
+from struct import Struct
+from time import sleep, time
+
+from siemens.fleet import PACFleet
+from siemens.pac import PAC
+from siemens.registers import REGISTERS
+from siemens.timing import monotonic
+
+# Number of rows
+HEADER = Struct(str('<Q'))
+# Sequence number of the seqlock, odd while the row is being written
+_SEQUENCE = Struct(str('<Q'))
+# Time of the last successful read, consecutive failed reads and values in the order of PAC.FIELDS
+_DATA = Struct(str('<dQ%dd' % len(PAC.FIELDS)))
+ROW_SIZE = _SEQUENCE.size + _DATA.size
+
+# Stale is set if the row stayed mid-write, e.g. after its writer died, and values may be inconsistent
+Reading = namedtuple('Reading', ['timestamp', 'failures', 'values', 'stale'])
+# Retries of reading a row without yielding, before yielding between retries
+_SPINS = 100
+
+# Names of tables created by this process
+_created = set()
+
+
+class SharedTable(object):
+    '''
+    Latest readings of meters in shared memory, a row for each meter and a column for each of PAC.FIELDS.
+    Created with a number of rows, or attached to by name from other processes.
+
+    Each row has a single writer, and is protected by a seqlock: readers retry until they get
+    a copy of the row that wasn't written meanwhile, without ever blocking the writer.
+    A row still being written after timeout seconds is returned as stale.
+    '''
+    def __init__(self, rows=None, name=None, timeout=0.1):
+        self.timeout = timeout
+        if name is None:
+            self._memory = shared_memory.SharedMemory(create=True, size=HEADER.size + max(1, rows) * ROW_SIZE)
+            HEADER.pack_into(self._memory.buf, 0, rows)
+            _created.add(self._memory.name)
+            self._owner = True
+        else:
+            self._memory = _attach(name)
+            self._owner = False
+        self.rows = HEADER.unpack_from(self._memory.buf, 0)[0]
+
+    @property
+    def name(self):
+        return self._memory.name
+
+    def _offset(self, row):
+        if not 0 <= row < self.rows:
+            raise IndexError('Row %d out of range.' % row)
+        return HEADER.size + row * ROW_SIZE
+
+    def _write(self, row, timestamp, failures, values):
+        buf = self._memory.buf
+        offset = self._offset(row)
+        sequence = _SEQUENCE.unpack_from(buf, offset)[0]
+        # Left odd by a writer that died mid-write
+        sequence += sequence & 1
+        _SEQUENCE.pack_into(buf, offset, sequence + 1)
+        _DATA.pack_into(buf, offset + _SEQUENCE.size, timestamp, failures, *values)
+        _SEQUENCE.pack_into(buf, offset, sequence + 2)
+
+    def write(self, row, timestamp, values):
+        ''' Writes values of a successful read of a meter. '''
+        self._write(row, timestamp, 0, values)
+
+    def fail(self, row):
+        ''' Counts a failed read of a meter, keeping its last values. '''
+        reading = self.read(row)
+        if reading is None:
+            self._write(row, float('nan'), 1, [float('nan')] * len(PAC.FIELDS))
+        else:
+            self._write(row, reading.timestamp, reading.failures + 1, reading.values)
+
+    def read(self, row):
+        '''
+        Returns a consistent Reading of a meter, or None if it hasn't been written yet.
+        A row being written for longer than SharedTable.timeout is returned as stale instead of waiting for it.
+        '''
+        buf = self._memory.buf
+        offset = self._offset(row)
+        retries = 0
+        deadline = None
+        while True:
+            sequence = _SEQUENCE.unpack_from(buf, offset)[0]
+            data = _DATA.unpack_from(buf, offset + _SEQUENCE.size)
+            if not sequence & 1 and _SEQUENCE.unpack_from(buf, offset)[0] == sequence:
+                break
+            retries += 1
+            if retries >= _SPINS:
+                now = monotonic()
+                if deadline is None:
+                    deadline = now + self.timeout
+                elif now >= deadline:
+                    return Reading(data[0], data[1], data[2:], True)
+                # Yields to the writer
+                sleep(0)
+        if sequence == 0:
+            return None
+        return Reading(data[0], data[1], data[2:], False)
+
+    def snapshot(self):
+        ''' Returns Readings of all meters, None for those not written yet. '''
+        return [self.read(row) for row in range(self.rows)]
+
+    def close(self):
+        self._memory.close()
+        if self._owner:
+            self._memory.unlink()
+            _created.discard(self._memory.name)
+
+
+def _attach(name):
+    ''' Attaches to shared memory, which is unlinked only by the process creating it. '''
+    try:
+        # Python 3.13+
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        memory = shared_memory.SharedMemory(name=name)
+    # Before 3.13 the resource tracker would unlink it when an unrelated process exits.
+    # The creating process and its children share a tracker, which the creator unregisters from.
+    if name not in _created and multiprocessing.parent_process() is None:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(memory._name, 'shared_memory')
+    return memory
+
+
+class _ValuesFleet(PACFleet):
+    ''' PACFleet returning (timestamp, PAC.values()) of each device, leaving out building dictionaries. '''
+    def _read(self, device):
+        device.read(self.groups)
+        return time(), device.values()
+
+
+def _work(name, rows, factories, stop, interval, timeout, max_workers, groups):
+    ''' Polls devices created by factories until stop is set, writing readings to given rows. '''
+    table = SharedTable(name=name)
+    fleet = _ValuesFleet(
+        dict((row, factory()) for row, factory in zip(rows, factories)),
+        interval=interval, timeout=timeout, max_workers=max_workers, groups=groups,
+    )
+    try:
+        for snapshot in fleet.run():
+            for row, (timestamp, values) in snapshot.results.items():
+                table.write(row, timestamp, values)
+            for row in snapshot.errors:
+                table.fail(row)
+            if stop.is_set():
+                break
+    finally:
+        fleet.close()
+        table.close()
+
+
+class ShardedPoller(object):
+    '''
+    Polls PAC devices in worker processes, each polling its share of the devices like a PACFleet.
+    Latest readings are in ShardedPoller.table, in the order of ShardedPoller.keys.
+
+    Devices are given as callables creating PACs, such as functools.partial(PACx200, host),
+    either as a list (keyed by index) or a dict (keyed by name). They must be picklable,
+    unless the start method of multiprocessing is fork.
+    '''
+    def __init__(self, devices, processes=None, interval=1.0, timeout=None, max_workers=8,
+                 groups=tuple(REGISTERS), start_method=None):
+        if not isinstance(devices, dict):
+            devices = dict(enumerate(devices))
+        self.keys = list(devices.keys())
+        self.processes = min(len(self.keys), processes or multiprocessing.cpu_count()) or 1
+        self.interval = interval
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.groups = tuple(groups)
+        self.table = None
+        self._factories = [devices[key] for key in self.keys]
+        self._context = multiprocessing.get_context(start_method)
+        self._stop = None
+        self._workers = []
+
+    def start(self):
+        self.table = SharedTable(len(self.keys))
+        self._stop = self._context.Event()
+        for shard in range(self.processes):
+            rows = list(range(shard, len(self.keys), self.processes))
+            worker = self._context.Process(target=_work, args=(
+                self.table.name, rows, [self._factories[row] for row in rows], self._stop,
+                self.interval, self.timeout, self.max_workers, self.groups,
+            ))
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+        return self
+
+    def stop(self):
+        ''' Stops the workers after their current cycle, and frees the table. '''
+        self._stop.set()
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+        self.table.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
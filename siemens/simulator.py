@@ -0,0 +1,258 @@
+'''
+In-process simulator of a PAC3200, serving the register map used in siemens.pac
+over Modbus TCP/IP or Modbus RTU through a pseudo-terminal.
+Latency, jitter and faults can be configured, for testing and benchmarking without a real device.
+'''
+from __future__ import unicode_literals, print_function, division
+import os
+import random
+import select
+import socket
+import socketserver
+import threading
+from struct import Struct, pack, unpack_from
+from time import sleep
+
+from modbus_tk.defines import READ_INPUT_REGISTERS, WRITE_MULTIPLE_REGISTERS
+from modbus_tk.utils import calculate_crc
+
+from siemens.registers import encode
+
+_MBAP = Struct(str('>HHHB'))
+_RANGE = Struct(str('>HH'))
+
+ILLEGAL_FUNCTION = 1
+ILLEGAL_DATA_ADDRESS = 2
+SLAVE_DEVICE_FAILURE = 4
+
+# Registers which can be read, as (start, count)
+RANGES = ((1, 100), (801, 40))
+
+
+class PACSimulator(object):
+    '''
+    Register map of a single simulated PAC3200.
+
+    Each request is delayed by latency +- jitter seconds. Of the requests,
+    drop_rate is left unanswered and error_rate is answered with a
+    SLAVE_DEVICE_FAILURE exception.
+    '''
+    def __init__(self, latency=0, jitter=0, drop_rate=0, error_rate=0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.drop_rate = drop_rate
+        self.error_rate = error_rate
+        self.requests = 0
+        self.registers = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        # Voltages, currents, phase apparent and active powers
+        self.set_floats(1, [230.1, 229.8, 231.2])
+        self.set_floats(13, [5.2, 4.9, 6.1])
+        self.set_floats(19, [1196.5, 1126.0, 1410.3, 1100.0, 1050.0, 1300.0])
+        self.set_floats(55, [50.02])
+        self.set_floats(63, [3732.8, 3450.0])
+        # Active import and export, reactive import and export, apparent, for both tariffs
+        self.set_doubles(801, [152000.0, 43000.0, 12.0, 0.0, 41000.0, 9800.0, 0.0, 0.0, 160000.0, 45000.0])
+
+    def set_floats(self, start, values):
+        self.set_registers(start, encode(values, 'f'))
+
+    def set_doubles(self, start, values):
+        self.set_registers(start, encode(values, 'd'))
+
+    def set_registers(self, start, values):
+        with self._lock:
+            for i, value in enumerate(values):
+                self.registers[start + i] = value
+
+    def _exception(self, function_code, code):
+        return pack(str('>BB'), function_code | 0x80, code)
+
+    def handle(self, pdu):
+        ''' Returns response PDU to a request PDU, or None if the response is dropped. '''
+        delay = self.latency + self._random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            sleep(delay)
+        with self._lock:
+            self.requests += 1
+
+        function_code = unpack_from(str('>B'), pdu)[0]
+        if self._random.random() < self.drop_rate:
+            return None
+        if self._random.random() < self.error_rate:
+            return self._exception(function_code, SLAVE_DEVICE_FAILURE)
+
+        if function_code == READ_INPUT_REGISTERS:
+            start, count = _RANGE.unpack_from(pdu, 1)
+            if not any(first <= start and start + count <= first + size for first, size in RANGES):
+                return self._exception(function_code, ILLEGAL_DATA_ADDRESS)
+            with self._lock:
+                values = [self.registers.get(x, 0) for x in range(start, start + count)]
+            return pack(str('>BB%dH' % count), function_code, 2 * count, *values)
+
+        if function_code == WRITE_MULTIPLE_REGISTERS:
+            start, count = _RANGE.unpack_from(pdu, 1)
+            self.set_registers(start, unpack_from(str('>%dH' % count), pdu, 6))
+            return pdu[:5]
+
+        return self._exception(function_code, ILLEGAL_FUNCTION)
+
+
+def _units(units):
+    return units if isinstance(units, dict) else {1: units}
+
+
+def _recv_exactly(sock, length):
+    data = b''
+    while len(data) < length:
+        chunk = sock.recv(length - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+class _TcpHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        self.server.connections += 1
+        while True:
+            try:
+                header = _recv_exactly(self.request, _MBAP.size)
+                if header is None:
+                    return
+                transaction_id, _, length, unit = _MBAP.unpack(header)
+                pdu = _recv_exactly(self.request, length - 1)
+                if pdu is None:
+                    return
+            except socket.error:
+                return
+
+            simulator = self.server.units.get(unit)
+            if simulator is None:
+                # Gateway target device failed to respond
+                response = pack(str('>BB'), unpack_from(str('>B'), pdu)[0] | 0x80, 0x0b)
+            else:
+                response = simulator.handle(pdu)
+            if response is None:
+                continue
+            try:
+                self.request.sendall(_MBAP.pack(transaction_id, 0, len(response) + 1, unit) + response)
+            except socket.error:
+                return
+
+
+class _TcpServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+
+class TcpSimulator(object):
+    '''
+    Serves PACSimulators over Modbus TCP/IP, like a single device or a gateway.
+    Units are a PACSimulator, served as unit 1, or a dict of {unit: PACSimulator}.
+    Port 0 picks a free port, see TcpSimulator.address.
+    '''
+    def __init__(self, units, host='127.0.0.1', port=0):
+        self.units = _units(units)
+        self._server = _TcpServer((host, port), _TcpHandler)
+        self._server.units = self.units
+        self._server.connections = 0
+        self._thread = None
+
+    @property
+    def address(self):
+        return self._server.server_address
+
+    @property
+    def connections(self):
+        ''' Number of connections accepted. '''
+        return self._server.connections
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+class RtuSimulator(object):
+    '''
+    Serves PACSimulators over Modbus RTU through a pseudo-terminal, whose name is in RtuSimulator.port.
+    Units are a PACSimulator, served as unit 1, or a dict of {unit: PACSimulator}.
+    Requests to other units are left unanswered, like on a real bus. Requires a POSIX system.
+    '''
+    def __init__(self, units):
+        import tty
+        self.units = _units(units)
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        self._thread.join()
+        os.close(self._master)
+        os.close(self._slave)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    @staticmethod
+    def _frame_length(buffer):
+        ''' Returns length of the request frame at the start of buffer, None if more data is needed. '''
+        if len(buffer) < 2:
+            return None
+        if unpack_from(str('>B'), buffer, 1)[0] == WRITE_MULTIPLE_REGISTERS:
+            if len(buffer) < 7:
+                return None
+            return 9 + unpack_from(str('>B'), buffer, 6)[0]
+        return 8
+
+    def _run(self):
+        buffer = b''
+        while self._running:
+            if not select.select([self._master], [], [], 0.05)[0]:
+                # Silent interval, discard partial frames
+                buffer = b''
+                continue
+            buffer += os.read(self._master, 256)
+            length = self._frame_length(buffer)
+            if length is None or len(buffer) < length:
+                continue
+            frame, buffer = buffer[:length], buffer[length:]
+            if unpack_from(str('>H'), frame, length - 2)[0] != calculate_crc(frame[:-2]):
+                buffer = b''
+                continue
+
+            unit = unpack_from(str('>B'), frame)[0]
+            simulator = self.units.get(unit)
+            response = simulator.handle(frame[1:-2]) if simulator is not None else None
+            if response is None:
+                continue
+            response = pack(str('>B'), unit) + response
+            os.write(self._master, response + pack(str('>H'), calculate_crc(response)))
@@ -0,0 +1,173 @@
+'''
+Append-only log of PAC readings in fixed-width binary records, split in segment files.
+Range queries and field projections are served through mmap, unpacking only the requested fields.
+'''
+from __future__ import unicode_literals, print_function, division
+import mmap
+import os
+from bisect import bisect_right
+from struct import Struct
+from time import time
+
+from siemens.pac import PAC
+
+# Values stored for each reading, derived energy totals and balance are left out
+FIELDS = tuple(name for name in PAC.FIELDS if not name.startswith(('energy.', 'balance.')))
+_SELECT = [PAC.FIELDS.index(name) for name in FIELDS]
+
+MAGIC = b'SIEMPAC\x00'
+VERSION = 1
+HEADER = Struct(str('<8sHHI'))
+# Timestamp followed by FIELDS, as little-endian doubles
+RECORD = Struct(str('<%dd' % (len(FIELDS) + 1)))
+_DOUBLE = Struct(str('<d'))
+
+
+class _Segment(object):
+    def __init__(self, path, index_interval):
+        self.path = path
+        self.index_interval = index_interval
+        # Timestamp of every index_interval:th record
+        self.index = []
+        self.count = 0
+        self.last = None
+
+        size = os.path.getsize(path)
+        if size < HEADER.size:
+            return
+        with open(path, 'rb') as f:
+            magic, version, fields, record_size = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+                raise ValueError('%s is not a compatible sample log segment.' % path)
+        self.count = (size - HEADER.size) // RECORD.size
+        if self.count:
+            mapped = self.map()
+            try:
+                self.index = [self.timestamp(mapped, i) for i in range(0, self.count, index_interval)]
+                self.last = self.timestamp(mapped, self.count - 1)
+            finally:
+                mapped.close()
+
+    @staticmethod
+    def timestamp(mapped, i):
+        return _DOUBLE.unpack_from(mapped, HEADER.size + i * RECORD.size)[0]
+
+    def map(self):
+        with open(self.path, 'rb') as f:
+            return mmap.mmap(f.fileno(), HEADER.size + self.count * RECORD.size, access=mmap.ACCESS_READ)
+
+    def added(self, timestamp):
+        if self.count % self.index_interval == 0:
+            self.index.append(timestamp)
+        self.count += 1
+        self.last = timestamp
+
+    def bisect(self, mapped, timestamp):
+        ''' Returns position of the first record with timestamp >= given one. '''
+        block = max(0, bisect_right(self.index, timestamp) - 1)
+        lo, hi = block * self.index_interval, min(self.count, (block + 1) * self.index_interval)
+        while lo < hi:
+            middle = (lo + hi) // 2
+            if self.timestamp(mapped, middle) < timestamp:
+                lo = middle + 1
+            else:
+                hi = middle
+        return lo
+
+
+class SampleLog(object):
+    '''
+    Append-only log of PAC readings in a directory of segment files, each holding up to segment_records records.
+    Timestamps must not decrease. A sparse index of every index_interval:th timestamp is kept in memory.
+    '''
+    def __init__(self, directory, segment_records=65536, index_interval=256):
+        self.directory = directory
+        self.segment_records = segment_records
+        self.index_interval = index_interval
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._segments = [
+            _Segment(os.path.join(directory, name), index_interval)
+            for name in sorted(os.listdir(directory)) if name.endswith('.seg')
+        ]
+        self._file = None
+
+    def __len__(self):
+        return sum(segment.count for segment in self._segments)
+
+    def _writable(self):
+        if self._file is not None and self._segments[-1].count < self.segment_records:
+            return self._file
+        self.close()
+
+        if self._segments and self._segments[-1].count < self.segment_records:
+            path = self._segments[-1].path
+            if os.path.getsize(path) >= HEADER.size:
+                # A record cut short, e.g. by a crash, is dropped so that appended records stay aligned
+                with open(path, 'r+b') as f:
+                    f.truncate(HEADER.size + self._segments[-1].count * RECORD.size)
+                self._file = open(path, 'ab')
+                return self._file
+            # Header cut short, the segment is written again
+            del self._segments[-1]
+
+        path = os.path.join(self.directory, '%08d.seg' % len(self._segments))
+        self._file = open(path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, VERSION, len(FIELDS), RECORD.size))
+        self._file.flush()
+        self._segments.append(_Segment(path, self.index_interval))
+        return self._file
+
+    def append(self, timestamp, values):
+        ''' Appends a reading with values in the order of storage.FIELDS. '''
+        last = self._segments[-1].last if self._segments else None
+        if last is not None and timestamp < last:
+            raise ValueError('Timestamps must not decrease.')
+        self._writable().write(RECORD.pack(timestamp, *values))
+        self._segments[-1].added(timestamp)
+
+    def append_pac(self, pac, timestamp=None):
+        ''' Appends current values of a PAC. Timestamp defaults to current time. '''
+        values = pac.values()
+        self.append(time() if timestamp is None else timestamp, [values[i] for i in _SELECT])
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def query(self, since=None, until=None, fields=FIELDS):
+        '''
+        Generator yielding (timestamp, value, ...) of given fields for readings with timestamps in [since, until).
+        Only the requested fields are unpacked from the mapped segments.
+        '''
+        self.flush()
+        offsets = [(i + 1) * _DOUBLE.size for i in [FIELDS.index(name) for name in fields]]
+        for segment in self._segments:
+            if not segment.count or (since is not None and segment.last < since):
+                continue
+            if until is not None and segment.index[0] >= until:
+                break
+
+            mapped = segment.map()
+            try:
+                start = 0 if since is None else segment.bisect(mapped, since)
+                stop = segment.count if until is None else segment.bisect(mapped, until)
+                for i in range(start, stop):
+                    position = HEADER.size + i * RECORD.size
+                    yield (_DOUBLE.unpack_from(mapped, position)[0], ) + tuple(
+                        _DOUBLE.unpack_from(mapped, position + offset)[0] for offset in offsets)
+            finally:
+                mapped.close()
+
+    def column(self, field, since=None, until=None):
+        ''' Returns ([timestamps], [values]) of a single field for readings in [since, until). '''
+        timestamps, values = [], []
+        for timestamp, value in self.query(since, until, (field, )):
+            timestamps.append(timestamp)
+            values.append(value)
+        return timestamps, values
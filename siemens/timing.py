@@ -0,0 +1,40 @@
+from __future__ import unicode_literals, print_function, division
+from time import monotonic, perf_counter as clock, sleep
+
+
+class Ticker(object):
+    '''
+    Schedules ticks on a fixed period of monotonic time.
+    Slow work between ticks doesn't make the period drift, instead ticks
+    that are already late by a full period are skipped and reported as missed.
+    An interval of 0 ticks without waiting, and never misses a tick.
+    '''
+    def __init__(self, interval):
+        if interval < 0:
+            raise ValueError('Interval must not be negative.')
+        self.interval = interval
+        self.tick = -1
+        self._next = monotonic()
+
+    def delay(self):
+        ''' Advances to the next tick. Returns (seconds until the tick, number of ticks missed before it). '''
+        if not self.interval:
+            self.tick += 1
+            return 0.0, 0
+
+        now = monotonic()
+        missed = 0
+        if now - self._next >= self.interval:
+            missed = int((now - self._next) // self.interval)
+            self._next += missed * self.interval
+        deadline = self._next
+        self._next += self.interval
+        self.tick += missed + 1
+        return max(0.0, deadline - now), missed
+
+    def wait(self):
+        ''' Sleeps until the next tick. Returns the number of ticks missed before it. '''
+        delay, missed = self.delay()
+        if delay > 0:
+            sleep(delay)
+        return missed
@@ -0,0 +1,143 @@
+# -*- encoding: utf-8 -*-
+from __future__ import print_function, unicode_literals, division
+import asyncio
+from struct import pack, unpack
+import pytest
+from siemens.aio import AsyncPACx200
+from siemens.capture import CaptureWriter, read_capture
+from siemens.simulator import PACSimulator, TcpSimulator
+from tests.test_pac import FakeMaster, assert_values
+
+
+async def serve(master, reader, writer):
+    ''' Answers Modbus TCP requests from a FakeMaster. '''
+    while True:
+        try:
+            header = await reader.readexactly(7)
+        except asyncio.IncompleteReadError:
+            break
+        transaction_id, _, length, unit = unpack(str('>HHHB'), header)
+        pdu = await reader.readexactly(length - 1)
+        function_code, start, count = unpack(str('>BHH'), pdu[:5])
+        if function_code == 4:
+            values = master.execute(unit, function_code, start, count)
+            response = pack(str('>BB%dH' % count), function_code, count * 2, *values)
+        else:
+            values = unpack(str('>%dH' % count), pdu[6:])
+            master.execute(unit, function_code, start, output_value=values)
+            response = pdu[:5]
+        writer.write(pack(str('>HHHB'), transaction_id, 0, len(response) + 1, unit) + response)
+    writer.close()
+
+
+def run(coroutine_function):
+    async def main():
+        master = FakeMaster()
+        server = await asyncio.start_server(lambda r, w: serve(master, r, w), '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        pac = AsyncPACx200('127.0.0.1', port)
+        try:
+            await coroutine_function(pac, master)
+        finally:
+            pac.close()
+            server.close()
+    asyncio.run(main())
+
+
+def test_read():
+    async def check(pac, master):
+        await pac.read()
+        assert master.transactions == 2
+        assert pac.transactions == 2
+        assert_values(pac)
+    run(check)
+
+
+def test_read_separately():
+    async def check(pac, master):
+        await asyncio.gather(pac.read_power(), pac.read_phases(), pac.read_frequency(), pac.read_energy())
+        assert master.transactions == 4
+        assert_values(pac)
+    run(check)
+
+
+def test_clear_tariff():
+    async def check(pac, master):
+        await pac.read()
+        await pac.clear_tariff(2)
+        assert pac.tariff_2.energy_import.active == 0
+        assert pac.tariff_1.energy_import.active == 1
+    run(check)
+
+
+def test_stream():
+    async def check(pac, master):
+        samples = pac.stream(0.02, groups=['frequency'])
+        first = await samples.__anext__()
+        second = await samples.__anext__()
+        assert second.tick == 1
+        assert 0.015 < second.timestamp - first.timestamp < 0.04
+        assert second.values[-1] == 50
+        assert master.transactions == 2
+        await samples.aclose()
+    run(check)
+
+
+def test_cache():
+    async def check(pac, master):
+        pac.cache_ttl = 60
+        await asyncio.gather(*[pac.read_power() for _ in range(5)])
+        assert master.transactions == 1
+        await pac.read()
+        assert pac.transactions == 2
+        await pac.clear_tariff(1)
+        assert pac.tariff_1.energy_import.active == 0
+        assert master.transactions == 1 + 2 + 5 + 1
+    run(check)
+
+
+def test_batch():
+    async def check(pac, master):
+        pac.cache_ttl = 60
+        await pac.read_energy()
+        batch = pac.batch()
+        batch.clear_tariff(1)
+        batch.clear_tariff(2)
+        assert await batch.commit() == 2
+        assert pac.tariff_2.energy_export.apparent == 0
+        assert all(master.registers[x] == 0 for x in range(801, 841))
+    run(check)
+
+
+def test_capture(tmpdir):
+    path = str(tmpdir.join('async.cap'))
+
+    async def check(pac, master):
+        with CaptureWriter(path) as capture:
+            pac.capture = capture
+            await pac.read_frequency()
+    run(check)
+
+    frame, = read_capture(path)
+    assert frame.device.startswith('127.0.0.1:')
+    # 50.0 as a big-endian float
+    assert frame.registers == (0x4248, 0)
+
+
+def test_cancelled_read():
+    async def main(address):
+        pac = AsyncPACx200(*address)
+        try:
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(pac.read_power(), 0.05)
+            # The late response of the cancelled read isn't taken for the next one
+            await pac.read_frequency()
+            await pac.read_power()
+        finally:
+            pac.close()
+        assert pac.frequency == pytest.approx(50.02)
+        assert pac.power.active == pytest.approx(3450)
+
+    with TcpSimulator(PACSimulator(latency=0.1)) as server:
+        asyncio.run(main(server.address))
+        assert server.connections == 2
@@ -0,0 +1,81 @@
+# -*- encoding: utf-8 -*-
+from __future__ import print_function, unicode_literals, division
+from math import isnan
+import pytest
+from siemens.electricity import Phase, Power
+from tests.test_pac import make_pac
+
+numpy = pytest.importorskip('numpy')
+from siemens.analytics import imbalance, phase_powers, power_factor, reactive, site_totals, stack  # noqa: E402
+
+NAN = float('nan')
+
+
+def same(a, b):
+    return (isnan(a) and isnan(b)) or a == pytest.approx(b)
+
+
+def test_stack():
+    pacs = [make_pac(), make_pac()]
+    for pac in pacs:
+        pac.read()
+    pacs[1].L2 = Phase(240, 5)
+
+    keys, phases = stack(pacs)
+    assert keys == [0, 1]
+    assert phases.voltage.shape == (2, 3)
+    assert phases.voltage[0].tolist() == [230, 231, 232]
+    assert phases.apparent[1].tolist() == [230, 1200, 696]
+    assert isnan(phases.active[1, 1])
+
+    keys, from_dicts = stack({'a': pacs[0].as_dict(), 'b': pacs[1].as_dict()})
+    assert keys == ['a', 'b']
+    for name in phases._fields:
+        numpy.testing.assert_array_equal(getattr(from_dicts, name), getattr(phases, name))
+
+
+def test_matches_objects():
+    voltage = numpy.array([[230, 231, 229], [230, 230, 230], [NAN, 230, 0]])
+    current = numpy.array([[1, 2, 3], [5, 5, 5], [1, 1, 1]])
+    apparent = numpy.array([[230, 462, NAN], [1150, 0, 1000], [NAN, 230, 0]])
+    active = numpy.array([[200, 400, NAN], [1200, 0, 900], [NAN, 200, 0]])
+
+    apparent, active = phase_powers(voltage, current, apparent, active)
+    calculated = reactive(apparent, active)
+    factors = power_factor(apparent, active)
+    for i in range(3):
+        for j in range(3):
+            phase = Phase(voltage[i, j], current[i, j], *[float(x) for x in (apparent[i, j], active[i, j])])
+            assert same(apparent[i, j], phase.power.apparent)
+            if phase.power.apparent >= phase.power.active or isnan(phase.power.active):
+                assert same(calculated[i, j], phase.power.reactive)
+            else:
+                assert isnan(calculated[i, j])
+            if phase.power.apparent:
+                assert same(factors[i, j], phase.power.power_factor)
+            else:
+                assert isnan(factors[i, j])
+
+    assert reactive([5.0, 5.0], [3.0, 3.0], [NAN, 1.0]).tolist() == [4, 1]
+
+
+def test_imbalance():
+    result = imbalance([[230, 230, 230], [220, 230, 240], [NAN, 230, 230], [0, 0, 0]])
+    assert result[:2].tolist() == [0, pytest.approx(10 / 230)]
+    assert isnan(result[2]) and isnan(result[3])
+
+
+def test_site_totals():
+    pacs = [make_pac() for _ in range(3)]
+    for pac in pacs:
+        pac.read()
+    _, phases = stack(pacs)
+    totals = site_totals(phases, ['b', 'a', 'b'])
+
+    assert totals.sites.tolist() == ['a', 'b']
+    assert totals.current.tolist() == [6, 12]
+    assert totals.voltage.tolist() == [231, 231]
+    total = sum([pac.L1.power + pac.L2.power + pac.L3.power for pac in pacs[::2]], Power(0, 0))
+    assert totals.apparent[1] == total.apparent
+    assert totals.active[1] == total.active
+    assert totals.reactive[1] == pytest.approx(total.reactive)
@@ -0,0 +1,123 @@
+# -*- encoding: utf-8 -*-
+from __future__ import print_function, unicode_literals, division
+import pytest
+from siemens.capture import CaptureWriter, ReplayMaster
+from tests.test_pac import FakeMaster, make_pac, to_registers
+
+
+class CountingMaster(FakeMaster):
+    ''' Energy counters keep counting after being cleared. '''
+    def __init__(self, counted):
+        super(CountingMaster, self).__init__()
+        self.counted = counted
+
+    def execute(self, unit, function_code, start, count=0, output_value=None, **kwargs):
+        result = super(CountingMaster, self).execute(unit, function_code, start, count, output_value)
+        if output_value is not None and 801 <= start < 841:
+            self.set(start, 'd', self.counted)
+        return result
+
+
+class ReadOnlyMaster(FakeMaster):
+    ''' Accepts writes, but ignores them. '''
+    def execute(self, unit, function_code, start, count=0, output_value=None, **kwargs):
+        if output_value is not None:
+            self.transactions += 1
+            return start, len(output_value)
+        return super(ReadOnlyMaster, self).execute(unit, function_code, start, count, output_value)
+
+
+def test_clear_both_tariffs():
+    pac = make_pac()
+    pac.read()
+    batch = pac.batch()
+    batch.clear_tariff(1)
+    batch.clear_tariff(2)
+    assert len(batch) == 40
+
+    assert batch.commit() == 2
+    assert len(batch) == 0
+    assert pac._master.transactions == 2 + 2
+    assert all(pac._master.registers[x] == 0 for x in range(801, 841))
+    assert pac.tariff_1.energy_import.active == 0
+    assert pac.tariff_2.energy_export.apparent == 0
+
+
+def test_clear_tariff():
+    pac = make_pac()
+    pac.read()
+    pac.clear_tariff(2)
+
+    # Five writes at 8 register strides, verified by a single read
+    assert pac._master.transactions == 2 + 5 + 1
+    assert pac.tariff_2.energy_import.active == 0
+    assert pac.tariff_1.energy_import.active == 1
+    assert pac._master.registers[801] != 0
+
+
+def test_clear_tariff_counting():
+    pac = make_pac()
+    pac._master = CountingMaster(2.5)
+    pac.clear_tariff(1)
+    # Tariffs are updated from the values read back
+    assert pac.tariff_1.energy_import.active == 2.5
+    assert pac.tariff_1.energy_export.apparent == 2.5
+    assert pac.tariff_2.energy_import.active == 2
+    assert 'energy' in pac.timestamps
+
+    for counted in (-1.0, 1e6, float('nan')):
+        pac._master = CountingMaster(counted)
+        with pytest.raises(IOError, match='Energy counter at register 801'):
+            pac.clear_tariff(1)
+
+
+def test_verify_capture(tmpdir):
+    path = str(tmpdir.join('clear.cap'))
+    pac = make_pac()
+    with CaptureWriter(path) as capture:
+        pac.capture = capture
+        pac.read()
+        pac.clear_tariff(1)
+        pac.read()
+
+    pac = make_pac()
+    pac._master = ReplayMaster(path)
+    pac.read()
+    pac.clear_tariff(1)
+    assert pac.tariff_1.energy_import.active == 0
+    pac.read()
+    assert pac.tariff_1.energy_import.active == 0
+    assert pac.tariff_2.energy_import.active == 2
+
+
+def test_write_energy_register():
+    pac = make_pac()
+    batch = pac.batch()
+    # Registers of a counter not written as a whole are compared exactly
+    batch.write(801, to_registers('d', 1)[:2])
+    assert batch.commit() == 2
+
+
+def test_merge():
+    pac = make_pac()
+    batch = pac.batch()
+    batch.write(900, [1, 2])
+    batch.write(902, [3])
+    batch.write(901, [5])
+    assert batch.commit(verify=False) == 1
+    assert [pac._master.registers[x] for x in (900, 901, 902)] == [1, 5, 3]
+    assert pac.batch().commit() == 0
+
+
+def test_verify():
+    pac = make_pac()
+    pac._master = ReadOnlyMaster()
+    pac._master.set(801, 'd', 43000)
+    pac.read()
+    batch = pac.batch()
+    batch.clear_tariff(1)
+    with pytest.raises(IOError, match='reads 43000.0 after writing 0.0'):
+        batch.commit()
+    # Failed batch can be committed again
+    assert len(batch) == 20
+    assert pac.tariff_1.energy_import.active == 43000
@@ -0,0 +1,75 @@
+# -*- encoding: utf-8 -*-
+from __future__ import print_function, unicode_literals, division
+import pytest
+from siemens.buffer import SampleBuffer
+from siemens.pac import PAC
+from tests.test_pac import make_pac
+
+
+def fill(buffer, count):
+    for i in range(count):
+        buffer.append(float(i), [float(i)] * len(buffer.fields))
+
+
+def test_append():
+    buffer = SampleBuffer(4, fields=['power.active', 'frequency'])
+    fill(buffer, 3)
+
+    assert len(buffer) == 3
+    assert list(buffer.timestamps()) == [0, 1, 2]
+    assert list(buffer.column('frequency')) == [0, 1, 2]
+
+
+def test_wrap():
+    buffer = SampleBuffer(4, fields=['power.active', 'frequency'])
+    fill(buffer, 10)
+
+    assert len(buffer) == 4
+    assert list(buffer.timestamps()) == [6, 7, 8, 9]
+    assert list(buffer.column('power.active')) == [6, 7, 8, 9]
+    assert list(buffer.column('power.active', slice(-2, None))) == [8, 9]
+    assert isinstance(buffer.column('power.active', slice(-2, None)), memoryview)
+    # Each value is stored once
+    assert buffer.nbytes == 3 * 4 * 8
+
+
+def test_window():
+    buffer = SampleBuffer(8, fields=['frequency'])
+    fill(buffer, 12)
+
+    window = buffer.window(6, 9)
+    assert list(buffer.timestamps(window)) == [6, 7, 8]
+    assert list(buffer.column('frequency', window)) == [6, 7, 8]
+    assert list(buffer.column('frequency', buffer.window(since=10))) == [10, 11]
+    assert list(buffer.column('frequency', buffer.window(until=0))) == []
+
+
+def test_append_pac():
+    pac = make_pac()
+    pac.read()
+    buffer = SampleBuffer(2)
+    buffer.append_pac(pac, timestamp=1)
+    subset = SampleBuffer(2, fields=['phases.L2.current', 'frequency'])
+    subset.append_pac(pac, timestamp=1)
+
+    assert len(buffer.fields) == len(PAC.FIELDS)
+    assert list(buffer.column('power.active')) == [1200]
+    assert list(buffer.column('tariffs.1.export.active')) == [4]
+    assert list(subset.column('phases.L2.current')) == [2]
+    assert list(subset.column('frequency')) == [50]
+
+
+def test_numpy():
+    numpy = pytest.importorskip('numpy')
+    buffer = SampleBuffer(4, fields=['frequency'], use_numpy=True)
+    fill(buffer, 6)
+    column = buffer.column('frequency')
+
+    assert isinstance(column, numpy.ndarray)
+    assert column.tolist() == [2, 3, 4, 5]
+    window = buffer.window(3, 5)
+    assert window == slice(1, 3)
+    assert buffer.column('frequency', window).tolist() == [3, 4]
+    # Samples within one run of the ring are a view
+    assert buffer.column('frequency', buffer.window(4)).base is not None
+    assert buffer.nbytes == 2 * 4 * 8
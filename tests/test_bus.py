@@ -0,0 +1,64 @@
+# -*- encoding: utf-8 -*-
+from __future__ import print_function, unicode_literals, division
+import os
+from threading import Thread
+from time import sleep
+from siemens.bus import FairScheduler, RtuBus
+from siemens.pac import PAC3100
+from tests.test_pac import FakeMaster, assert_values
+
+
+def test_scheduler_round_robin():
+    scheduler = FairScheduler()
+    order = []
+
+    def request(unit):
+        scheduler.acquire(unit)
+        order.append(unit)
+        scheduler.release()
+
+    # Hold the scheduler while unit 1 queues three requests and unit 2 one
+    scheduler.acquire(0)
+    threads = []
+    for unit in (1, 1, 1, 2):
+        threads.append(Thread(target=request, args=(unit, )))
+        threads[-1].start()
+        sleep(0.02)
+    scheduler.release()
+    for thread in threads:
+        thread.join()
+
+    assert order == [1, 2, 1, 1]
+
+
+def make_bus():
+    master, slave = os.openpty()
+    bus = RtuBus(os.ttyname(slave), baudrate=9600)
+    bus._master.close()
+    bus._master = FakeMaster()
+    return bus
+
+
+def test_bus_devices():
+    bus = make_bus()
+    devices = [bus.device(unit) for unit in (1, 2, 3)]
+    for device in devices:
+        assert isinstance(device, PAC3100)
+        device.read()
+        assert_values(device)
+        device.close()
+
+    assert [device._unit for device in devices] == [1, 2, 3]
+    assert bus._master.transactions == 6
+
+
+def test_bus_gap():
+    bus = make_bus()
+    device = bus.device(1)
+    bus.gap = 0.05
+    device.read_power()
+    device.read_power()
+    start = bus._last_frame
+    device.read_power()
+
+    assert bus._last_frame - start >= 0.05
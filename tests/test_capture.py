@@ -0,0 +1,105 @@
+# -*- encoding: utf-8 -*-
+from __future__ import print_function, unicode_literals, division
+import os
+import pytest
+from siemens.capture import CaptureWriter, ReplayMaster, read_capture
+from siemens.demand import DemandTracker
+from siemens.pac import PAC
+from siemens.timing import monotonic
+from tests.test_pac import assert_values, make_pac, to_registers
+
+
+def replay_pac(master):
+    pac = PAC()
+    pac._master = master
+    pac._unit = 1
+    return pac
+
+
+def test_record_and_replay(tmpdir):
+    path = str(tmpdir.join('meters.cap'))
+    with CaptureWriter(path) as capture:
+        first, second = make_pac(), make_pac()
+        first.name, second.name = 'first', 'second'
+        first.capture = second.capture = capture
+        first.read()
+        second.read_power()
+        second._master.set(63, 'ff', 2000, 1800)
+        second.read_power()
+        first.read()
+
+    frames = list(read_capture(path))
+    assert [(frame.device, frame.start, len(frame.registers)) for frame in frames] == [
+        ('first', 1, 66), ('first', 801, 40), ('second', 63, 4), ('second', 63, 4),
+        ('first', 1, 66), ('first', 801, 40)]
+    assert frames[0].timestamp <= frames[-1].timestamp
+
+    pac = replay_pac(ReplayMaster(path, device='first'))
+    pac.read()
+    assert_values(pac)
+    pac.read()
+    with pytest.raises(EOFError):
+        pac.read()
+
+    master = ReplayMaster(path, device='second')
+    pac = replay_pac(master)
+    pac.read_power()
+    pac.read_power()
+    assert pac.power.active == 1800
+    assert master.timestamp == frames[3].timestamp
+    pac.close()
+
+    # Registers within a captured frame can be read, others can't
+    pac = replay_pac(ReplayMaster(path, device='first'))
+    pac.read_frequency()
+    assert pac.frequency == 50
+    with pytest.raises(ValueError):
+        pac.read_phases()
+
+
+def test_replay_timestamps(tmpdir):
+    path = str(tmpdir.join('energy.cap'))
+    with CaptureWriter(path) as capture:
+        # Hourly counter readings, with 1 kWh of active import on tariff 1 every hour
+        for hour in range(4):
+            counters = to_registers('dddddddddd', 1000.0 * hour, 2, 3, 4, 5, 6, 7, 8, 9, 10)
+            capture.record('meter', 1, 801, counters, timestamp=3600.0 * hour)
+
+    pac = replay_pac(ReplayMaster(path))
+    tracker = DemandTracker(3600)
+    intervals = []
+    for _ in range(4):
+        pac.read_energy()
+        intervals.extend(tracker.update_pac(pac))
+
+    assert pac.timestamps['energy'] == 3 * 3600
+    assert [interval.start for interval in intervals] == [0, 3600, 7200]
+    assert all(interval.covered == 3600 for interval in intervals)
+    assert all(interval.consumption.energy_import.active == 1000 for interval in intervals)
+
+
+def test_replay_timing(tmpdir):
+    path = str(tmpdir.join('timing.cap'))
+    with CaptureWriter(path) as capture:
+        for i in range(3):
+            capture.record('pac', 1, 55, (1, 2), timestamp=1000.0 + i)
+
+    pac = replay_pac(ReplayMaster(path, speed=20))
+    start = monotonic()
+    for _ in range(3):
+        pac.read_frequency()
+    assert 0.09 < monotonic() - start < 0.3
+
+
+def test_truncated(tmpdir):
+    path = str(tmpdir.join('truncated.cap'))
+    with CaptureWriter(path) as capture:
+        for i in range(3):
+            capture.record(None, 1, 63, (1, 2, 3, 4))
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) - 1)
+
+    frames = list(read_capture(path))
+    assert len(frames) == 2
+    assert frames[0].device == ''
+    assert frames[0].registers == (1, 2, 3, 4)
@@ -0,0 +1,50 @@
+# -*- encoding: utf-8 -*-
+from __future__ import print_function, unicode_literals, division
+from time import sleep
+from siemens.deadband import DeadbandFilter
+from tests.test_pac import make_pac
+
+
+def test_first_update():
+    pac = make_pac()
+    pac.read()
+    deadband = DeadbandFilter(pac, replace_nan=True)
+
+    assert deadband.update() == pac.as_dict(replace_nan=True)
+    assert deadband.update() == {}
+
+
+def test_deadband():
+    pac = make_pac()
+    pac.read()
+    deadband = DeadbandFilter(pac, absolute=1, deadbands={'frequency': (0, 0.001)})
+    deadband.update()
+
+    pac._master.set(63, 'ff', 1388.5, 1210)
+    pac._master.set(55, 'f', 50.01)
+    pac._master.set(805, 'd', 5)
+    pac.read()
+    diff = deadband.update()
+
+    assert diff == {
+        'power': {'active': {'unit': 'W', 'value': 1210}, 'reactive': diff['power']['reactive']},
+        'tariffs': [{}, {'import': {'active': {'unit': 'Wh', 'value': 5}}}],
+        'energy': {'import': {'active': {'unit': 'Wh', 'value': 6}}},
+        'balance': {'active': {'unit': 'Wh', 'value': -1}},
+    }
+
+    # Frequency changes beyond the relative deadband
+    pac._master.set(55, 'f', 50.1)
+    pac.read()
+    assert deadband.update() == {'frequency': pac.frequency}
+
+
+def test_refresh():
+    pac = make_pac()
+    pac.read()
+    deadband = DeadbandFilter(pac, absolute=1000, refresh=0.05)
+
+    assert deadband.update() == pac.as_dict()
+    assert deadband.update() == {}
+    sleep(0.06)
+    assert deadband.update() == pac.as_dict()
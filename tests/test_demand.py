@@ -0,0 +1,86 @@
+# -*- encoding: utf-8 -*-
+from __future__ import print_function, unicode_literals, division
+from math import isnan
+import pytest
+from siemens.demand import DemandTracker
+from siemens.electricity import Energy, Tariff
+from tests.test_pac import make_pac
+
+
+def tariff(active_import, active_export=0.0):
+    return Tariff(Energy(active_import, active_import, 0.0), Energy(active_export, active_export, 0.0))
+
+
+def test_intervals():
+    tracker = DemandTracker(900)
+    assert tracker.update(450, [tariff(1000), tariff(0)]) == []
+    assert tracker.update(600, [tariff(1100), tariff(0)]) == []
+    # 3000 Wh over 1800 s, spanning the end of the first and the whole second interval
+    finished = tracker.update(2400, [tariff(4100), tariff(0, 30)])
+    assert [(interval.start, interval.end) for interval in finished] == [(0, 900), (900, 1800)]
+
+    first, second = finished
+    assert first.covered == 450
+    assert first.tariffs[0].energy_import.active == pytest.approx(100 + 500)
+    assert first.tariffs[1].energy_export.active == pytest.approx(5)
+    assert second.covered == 900
+    assert second.consumption.energy_import.active == pytest.approx(1500)
+    power_import, power_export = second.demand
+    assert power_import.active == pytest.approx(6000)
+    assert power_export.active == pytest.approx(60)
+
+    current = tracker.current()
+    assert (current.start, current.covered) == (1800, 600)
+    assert current.consumption.energy_import.active == pytest.approx(1000)
+
+    # Same reading again, e.g. from the cache, and a reading from before the clock was set back
+    assert tracker.update(2400, [tariff(4100), tariff(0, 30)]) == []
+    assert tracker.update(2000, [tariff(5000), tariff(0)]) == []
+    current = tracker.current()
+    assert (current.covered, current.ignored) == (600, 1)
+    assert current.consumption.energy_import.active == pytest.approx(1000)
+    with pytest.raises(ValueError):
+        tracker.update(2500, [tariff(4100)])
+
+
+def test_reset_and_rollback():
+    tracker = DemandTracker(60)
+    tracker.update(0, [tariff(1000), tariff(500)])
+    tracker.update(10, [tariff(1010), tariff(500)])
+    # Tariff 2 cleared, counting 2 Wh since
+    tracker.update(20, [tariff(1020), tariff(2)])
+    # Active import went back, but export increased
+    tracker.update(30, [tariff(900, 5), tariff(2)])
+    tracker.update(40, [tariff(910, 5), tariff(3)])
+    # Ignored
+    tracker.update(50, [tariff(float('nan')), tariff(3)])
+
+    interval = tracker.update(60, [tariff(920, 5), tariff(4)])[0]
+    assert (interval.resets, interval.rollbacks) == (1, 1)
+    assert interval.covered == 50
+    assert interval.tariffs[0].energy_import.active == pytest.approx(40)
+    assert interval.tariffs[1].energy_import.active == pytest.approx(4)
+
+
+def test_update_pac():
+    tracker = DemandTracker(10)
+    pac = make_pac()
+    pac.read_energy()
+    assert tracker.update_pac(pac, timestamp=5) == []
+    interval = tracker.update_pac(pac, timestamp=10)[0]
+    assert interval.covered == 5
+    assert interval.consumption.energy_import.active == 0
+
+    # Energy served from the cache has the timestamp of the previous reading
+    pac = make_pac()
+    pac.cache_ttl = 60
+    tracker = DemandTracker(10)
+    for _ in range(3):
+        pac.read_energy()
+        assert tracker.update_pac(pac) == []
+    assert pac._master.transactions == 1
+
+    assert DemandTracker().current() is None
+    empty = DemandTracker(10)
+    empty.update(0, [tariff(0)])
+    assert isnan(empty.current().demand[0].active)
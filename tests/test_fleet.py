@@ -0,0 +1,91 @@
+# -*- encoding: utf-8 -*-
+from __future__ import print_function, unicode_literals, division
+from concurrent.futures import TimeoutError
+from time import sleep
+from siemens.fleet import PACFleet
+from tests.test_pac import FakeMaster, make_pac
+
+
+class SlowMaster(FakeMaster):
+    def execute(self, *args, **kwargs):
+        sleep(0.3)
+        return super(SlowMaster, self).execute(*args, **kwargs)
+
+
+class DelayingMaster(FakeMaster):
+    def __init__(self, delay):
+        super(DelayingMaster, self).__init__()
+        self.delay = delay
+
+    def execute(self, *args, **kwargs):
+        sleep(self.delay)
+        return super(DelayingMaster, self).execute(*args, **kwargs)
+
+
+class BrokenMaster(FakeMaster):
+    def execute(self, *args, **kwargs):
+        raise IOError('Connection refused.')
+
+
+def make_fleet(**kwargs):
+    devices = {'ok': make_pac(), 'slow': make_pac(), 'broken': make_pac()}
+    devices['slow']._master = SlowMaster()
+    devices['broken']._master = BrokenMaster()
+    return PACFleet(devices, **kwargs)
+
+
+def test_poll():
+    fleet = make_fleet(interval=0.1)
+    snapshot = fleet.poll()
+
+    assert list(snapshot.results) == ['ok']
+    assert snapshot.results['ok']['power']['active']['value'] == 1200
+    assert isinstance(snapshot.errors['slow'], TimeoutError)
+    assert isinstance(snapshot.errors['broken'], IOError)
+
+    # Slow device isn't polled again while its previous read is in flight
+    snapshot = fleet.poll()
+    assert isinstance(snapshot.errors['slow'], TimeoutError)
+    assert fleet.devices['slow']._master.transactions <= 1
+    fleet.close()
+
+
+def test_more_devices_than_workers():
+    devices = [make_pac() for _ in range(8)]
+    for device in devices:
+        # Reads take 0.1 seconds, so only some of them fit in each cycle
+        device._master = DelayingMaster(0.05)
+    fleet = PACFleet(devices, timeout=0.25, max_workers=2)
+    counts = dict((key, 0) for key in fleet.devices)
+    for _ in range(4):
+        snapshot = fleet.poll()
+        # Reads waiting for a worker aren't taken for devices not responding
+        assert snapshot.errors == {}
+        for key in snapshot.results:
+            counts[key] += 1
+    fleet.close()
+
+    assert all(count >= 1 for count in counts.values())
+
+
+def test_clear_tariffs():
+    fleet = make_fleet(interval=0.1)
+    snapshot = fleet.clear_tariffs()
+
+    # Single write and verifying read per device
+    assert snapshot.results == {'ok': 2, 'slow': 2}
+    assert isinstance(snapshot.errors['broken'], IOError)
+    assert fleet.devices['ok'].tariff_2.energy_export.active == 0
+    fleet.close()
+
+
+def test_run():
+    fleet = make_fleet(interval=0.1, timeout=0.05)
+    snapshots = fleet.run()
+
+    first = next(snapshots)
+    second = next(snapshots)
+    assert 0.09 < second.timestamp - first.timestamp < 0.15
+    assert second.missed == 0
+    assert 'ok' in second.results
+    fleet.close()
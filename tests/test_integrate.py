@@ -0,0 +1,44 @@
+# -*- encoding: utf-8 -*-
+from __future__ import print_function, unicode_literals, division
+from datetime import timedelta
+import pytest
+from siemens.electricity import Energy, Power, integrate
+
+numpy = pytest.importorskip('numpy')
+
+
+def test_rectangle():
+    timestamps = [0, 1, 3, 6, 10]
+    apparent = [100, 200, 300, 400, 500]
+    active = [80, 150, 250, 300, 400]
+    energy = integrate(timestamps, apparent, active, method='rectangle')
+
+    expected = Energy(0, 0, 0)
+    for i in range(len(timestamps) - 1):
+        expected += Power(apparent[i], active[i]) * timedelta(seconds=timestamps[i + 1] - timestamps[i])
+
+    assert isinstance(energy, Energy)
+    assert energy.apparent == pytest.approx(expected.apparent)
+    assert energy.active == pytest.approx(expected.active)
+    assert energy.reactive == pytest.approx(expected.reactive)
+
+
+def test_trapezoid():
+    energy = integrate([0, 1800, 3600], [0, 1000, 2000], [0, 500, 1000], [10, float('nan'), 10])
+
+    assert energy.apparent == pytest.approx(1000)
+    assert energy.active == pytest.approx(500)
+    # Missing reactive power is calculated from apparent and active powers
+    assert energy.reactive == pytest.approx((10 + numpy.sqrt(1000 ** 2 - 500 ** 2)) / 2)
+
+
+def test_gaps():
+    timestamps = numpy.array(['2016-01-01T00:00', '2016-01-01T00:30', '2016-01-01T01:00', '2016-01-01T03:00'],
+                             dtype='datetime64[s]')
+    apparent = [1000, 1000, float('nan'), 1000]
+    energy = integrate(timestamps, apparent, apparent, method='rectangle', max_gap=3600)
+
+    # Sample at 01:00 is NaN and the interval after it is over max_gap
+    assert energy.apparent == pytest.approx(1000)
+    assert energy.active == pytest.approx(1000)
+    assert energy.reactive == pytest.approx(0)
@@ -0,0 +1,75 @@
+# -*- encoding: utf-8 -*-
+from __future__ import print_function, unicode_literals, division
+import pytest
+from modbus_tk.defines import READ_INPUT_REGISTERS, WRITE_MULTIPLE_REGISTERS
+from siemens.metrics import Metrics
+from tests.test_pac import FakeMaster, make_pac
+
+
+class FlakyMaster(FakeMaster):
+    ''' Fails the first transactions. '''
+    def __init__(self, failures):
+        super(FlakyMaster, self).__init__()
+        self.failures = failures
+
+    def execute(self, *args, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise IOError('Connection reset.')
+        return super(FlakyMaster, self).execute(*args, **kwargs)
+
+
+def test_transactions():
+    transactions = []
+    pac = make_pac()
+    pac.name = 'meter'
+    pac.metrics = Metrics(callback=transactions.append)
+    pac.read()
+    pac.clear_tariff(1)
+
+    metrics = pac.metrics
+    # Clearing reads back all 40 energy registers
+    assert metrics.counter('registers', 'meter', READ_INPUT_REGISTERS) == 66 + 40 + 40
+    assert metrics.counter('registers', 'meter', WRITE_MULTIPLE_REGISTERS) == 5 * 4
+    assert metrics.counter('received_bytes', 'meter', READ_INPUT_REGISTERS) == 3 * 2 + 2 * (66 + 40 + 40)
+    assert metrics.counter('failures', 'meter', READ_INPUT_REGISTERS) == 0
+    counts, total, count = metrics.histogram('meter', READ_INPUT_REGISTERS)
+    assert count == sum(counts) == 3
+    assert total > 0
+
+    assert len(transactions) == 8
+    assert transactions[0].registers == 66
+    assert transactions[0].error is None
+
+    count, decode, construct = metrics.processing('meter', 'phases')
+    assert count == 1
+    assert decode > 0 and construct > 0
+
+
+def test_retries():
+    pac = make_pac()
+    pac._master = FlakyMaster(2)
+    pac.metrics = Metrics()
+    with pytest.raises(IOError):
+        pac.read_power()
+    assert pac.metrics.counter('failures', None, READ_INPUT_REGISTERS) == 1
+
+    pac.retries = 1
+    pac.read_power()
+    assert pac.power.active == 1200
+    assert pac.metrics.counter('retries', None, READ_INPUT_REGISTERS) == 1
+    assert pac.metrics.histogram(None, READ_INPUT_REGISTERS)[2] == 2
+
+
+def test_prometheus():
+    pac = make_pac()
+    pac.name = 'meter'
+    pac.metrics = Metrics()
+    pac.read()
+    text = pac.metrics.prometheus()
+
+    assert '# TYPE pac_transaction_seconds histogram' in text
+    assert 'pac_transaction_seconds_bucket{device="meter",function="4",le="+Inf"} 2' in text
+    assert 'pac_transaction_seconds_count{device="meter",function="4"} 2' in text
+    assert 'pac_registers_total{device="meter",function="4"} 106' in text
+    assert 'pac_decode_seconds_total{device="meter",group="energy"}' in text
@@ -0,0 +1,226 @@
+# -*- encoding: utf-8 -*-
+from __future__ import print_function, unicode_literals, division
+from struct import pack, unpack
+import threading
+from time import sleep
+import pytest
+from modbus_tk.defines import READ_INPUT_REGISTERS, WRITE_MULTIPLE_REGISTERS
+from siemens.pac import PAC
+
+
+def to_registers(fmt, *values):
+    data = pack(str('>' + fmt), *values)
+    return list(unpack(str('>%dH' % (len(data) // 2)), data))
+
+
+class FakeMaster(object):
+    ''' Serves input registers from a dictionary, counting the transactions made. '''
+    def __init__(self):
+        self.registers = {}
+        self.transactions = 0
+
+        self.set(1, 'fff', 230, 231, 232)
+        self.set(13, 'fff', 1, 2, 3)
+        self.set(19, 'ffffff', 230, 462, 696, 200, 400, 600)
+        self.set(55, 'f', 50)
+        self.set(63, 'ff', 1388, 1200)
+        self.set(801, 'dddddddddd', 1, 2, 3, 4, 5, 6, 7, 8, 9, 10)
+
+    def set(self, start, fmt, *values):
+        for i, value in enumerate(to_registers(fmt, *values)):
+            self.registers[start + i] = value
+
+    def execute(self, unit, function_code, start, count=0, output_value=None, **kwargs):
+        self.transactions += 1
+        if function_code == READ_INPUT_REGISTERS:
+            return tuple(self.registers.get(x, 0) for x in range(start, start + count))
+        if function_code == WRITE_MULTIPLE_REGISTERS:
+            for i, value in enumerate(output_value):
+                self.registers[start + i] = value
+            return start, len(output_value)
+
+    def close(self):
+        pass
+
+
+def make_pac():
+    pac = PAC()
+    pac._master = FakeMaster()
+    pac._unit = 1
+    return pac
+
+
+def assert_values(pac):
+    assert pac.power.apparent == 1388
+    assert pac.power.active == 1200
+    assert pac.L1.voltage == 230
+    assert pac.L2.current == 2
+    assert pac.L3.power.apparent == 696
+    assert pac.L3.power.active == 600
+    assert pac.frequency == 50
+    assert pac.tariff_1.energy_import.active == 1
+    assert pac.tariff_2.energy_export.active == 4
+    assert pac.tariff_1.energy_import.apparent == 9
+    assert pac.tariff_2.energy_export.reactive == 8
+
+
+def test_read():
+    pac = make_pac()
+    pac.read()
+
+    assert pac._master.transactions == 2
+    assert pac.transactions == 2
+    assert_values(pac)
+
+
+def test_read_separately():
+    pac = make_pac()
+    pac.read_power()
+    pac.read_phases()
+    pac.read_frequency()
+    pac.read_energy()
+
+    assert pac._master.transactions == 4
+    assert_values(pac)
+
+
+def test_read_groups():
+    pac = make_pac()
+    pac.read(['power', 'frequency'])
+
+    assert pac.transactions == 1
+    assert pac.power.active == 1200
+    assert pac.frequency == 50
+    assert pac.L1.voltage != pac.L1.voltage
+
+
+def test_clear_tariff():
+    pac = make_pac()
+    pac.read()
+    pac.clear_tariff(1)
+
+    assert pac.tariff_1.energy_import.active == 0
+    assert pac.tariff_1.energy_import.apparent == 0
+    assert pac.tariff_2.energy_import.active == 2
+
+
+def test_values():
+    pac = make_pac()
+    pac.read()
+    values = dict(zip(PAC.FIELDS, pac.values()))
+
+    assert len(PAC.FIELDS) == len(set(PAC.FIELDS)) == 40
+    for name, value in values.items():
+        node = pac.as_dict()
+        for key in name.split('.'):
+            node = node[int(key) if key.isdigit() else key]
+        if isinstance(node, dict):
+            node = node['value']
+        assert node == value or (node != node and value != value)
+
+
+def test_stream():
+    pac = make_pac()
+    samples = pac.stream(0.02, groups=['power'])
+    first = next(samples)
+    second = next(samples)
+
+    assert first.tick == 0
+    assert second.tick == 1
+    assert second.missed == 0
+    assert 0.015 < second.timestamp - first.timestamp < 0.04
+    assert dict(zip(PAC.FIELDS, second.values))['power.active'] == 1200
+    assert pac._master.transactions == 2
+
+
+def test_stream_zero_interval():
+    pac = make_pac()
+    samples = pac.stream(0, groups=['frequency'])
+    assert [next(samples).tick for _ in range(3)] == [0, 1, 2]
+
+
+def test_stream_missed():
+    pac = make_pac()
+    samples = pac.stream(0.02)
+    next(samples)
+    sleep(0.07)
+    sample = next(samples)
+
+    assert sample.missed == 2
+    assert sample.tick == 3
+
+
+def test_cache():
+    pac = make_pac()
+    pac.cache_ttl = 60
+    pac.read()
+    pac.read_power()
+    pac.read(['power', 'frequency'])
+    assert pac._master.transactions == 2
+    assert pac.transactions == 0
+
+    # Energy is updated by the verifying read, but expired by the writes
+    pac.clear_tariff(2)
+    assert pac.tariff_2.energy_export.active == 0
+    assert pac._master.transactions == 2 + 5 + 1
+    pac.read_energy()
+    assert pac._master.transactions == 9
+
+    pac.cache_ttl = 0
+    pac.read_power()
+    assert pac._master.transactions == 10
+
+
+def test_cache_expired_by_writes():
+    pac = make_pac()
+    pac.cache_ttl = 60
+    pac.read_energy()
+    batch = pac.batch()
+    batch.clear_tariff(1)
+    batch.commit(verify=False)
+    # Not updated without verifying, but read again
+    assert pac.tariff_1.energy_import.active == 1
+    pac.read_energy()
+    assert pac.tariff_1.energy_import.active == 0
+    assert pac._master.transactions == 1 + 5 + 1
+
+
+class SlowMaster(FakeMaster):
+    def __init__(self, fail=False):
+        super(SlowMaster, self).__init__()
+        self.fail = fail
+        self.started = threading.Event()
+
+    def execute(self, *args, **kwargs):
+        self.started.set()
+        sleep(0.05)
+        if self.fail:
+            raise IOError('No response.')
+        return super(SlowMaster, self).execute(*args, **kwargs)
+
+
+@pytest.mark.parametrize('fail', [False, True])
+def test_cache_single_flight(fail):
+    pac = make_pac()
+    pac._master = SlowMaster(fail)
+    pac.cache_ttl = 60
+    errors = []
+
+    def read():
+        try:
+            pac.read_power()
+        except IOError as e:
+            errors.append(e)
+
+    first = threading.Thread(target=read)
+    first.start()
+    pac._master.started.wait()
+    others = [threading.Thread(target=read) for _ in range(4)]
+    for thread in others:
+        thread.start()
+    for thread in [first] + others:
+        thread.join()
+
+    assert pac._master.transactions == (0 if fail else 1)
+    assert len(errors) == (5 if fail else 0)
+    assert not pac._flights
@@ -0,0 +1,138 @@
+# -*- encoding: utf-8 -*-
+from __future__ import print_function, unicode_literals, division
+import random
+import socket
+import threading
+from struct import pack, unpack
+from time import sleep
+import pytest
+from modbus_tk.exceptions import ModbusError
+from siemens.pac import PACx200
+from siemens.pipeline import PipelinedTcpMaster
+from siemens.simulator import PACSimulator
+from siemens.timing import monotonic
+
+
+class DelayingServer(object):
+    '''
+    Answers each request of a connection after a random delay of its own, so responses of
+    outstanding requests arrive out of order. Requests to unit 99 are left unanswered.
+    '''
+    def __init__(self, simulator, min_delay=0.01, max_delay=0.05):
+        self.simulator = simulator
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.outstanding = 0
+        self.max_outstanding = 0
+        self._lock = threading.Lock()
+        self._server = socket.socket()
+        self._server.bind(('127.0.0.1', 0))
+        self._server.listen(5)
+        self.address = self._server.getsockname()
+        thread = threading.Thread(target=self._accept)
+        thread.daemon = True
+        thread.start()
+
+    def _accept(self):
+        while True:
+            try:
+                connection, _ = self._server.accept()
+            except socket.error:
+                return
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            thread = threading.Thread(target=self._serve, args=(connection, ))
+            thread.daemon = True
+            thread.start()
+
+    def _serve(self, connection):
+        send_lock = threading.Lock()
+        while True:
+            header = connection.recv(7, socket.MSG_WAITALL)
+            if len(header) < 7:
+                return
+            transaction_id, _, length, unit = unpack(str('>HHHB'), header)
+            pdu = connection.recv(length - 1, socket.MSG_WAITALL)
+            if unit == 99:
+                continue
+            with self._lock:
+                self.outstanding += 1
+                self.max_outstanding = max(self.max_outstanding, self.outstanding)
+            threading.Timer(random.uniform(self.min_delay, self.max_delay), self._respond, args=(
+                connection, send_lock, transaction_id, unit, pdu)).start()
+
+    def _respond(self, connection, send_lock, transaction_id, unit, pdu):
+        response = self.simulator.handle(pdu)
+        with self._lock:
+            self.outstanding -= 1
+        with send_lock:
+            try:
+                connection.sendall(pack(str('>HHHB'), transaction_id, 0, len(response) + 1, unit) + response)
+            except socket.error:
+                pass
+
+    def close(self):
+        self._server.close()
+
+
+@pytest.fixture
+def server():
+    server = DelayingServer(PACSimulator())
+    yield server
+    server.close()
+
+
+def test_read(server):
+    pac = PACx200(*server.address, pipeline=4)
+    pac.read()
+    assert pac.transactions == 2
+    assert server.max_outstanding == 2
+    assert pac.power.active == 3450
+    assert pac.frequency == pytest.approx(50.02)
+    assert pac.tariff_1.energy_import.active == 152000
+
+    pac.clear_tariff(1)
+    assert pac.tariff_1.energy_import.active == 0
+    assert pac.tariff_2.energy_import.active == 43000
+    # Limited by the window
+    assert server.max_outstanding == 4
+    pac.close()
+
+
+def test_out_of_order(server):
+    master = PipelinedTcpMaster(*server.address, window=8)
+    starts = list(range(1, 81, 2))
+    transactions = [master.submit(1, 4, start, 2) for start in starts]
+    for start, transaction in zip(starts, transactions):
+        assert transaction.result() == tuple(server.simulator.registers.get(x, 0) for x in (start, start + 1))
+    assert server.max_outstanding == 8
+
+    with pytest.raises(ModbusError):
+        master.execute(1, 4, 500, 2)
+    master.close()
+
+
+def test_timeout(server):
+    master = PipelinedTcpMaster(*server.address, timeout=0.2, window=2)
+    lost = master.submit(99, 4, 1, 2)
+    start = monotonic()
+    with pytest.raises(socket.timeout):
+        lost.result()
+    assert 0.15 < monotonic() - start < 0.5
+
+    # Unanswered transactions nobody waits for don't hold on to the window
+    master.submit(99, 4, 1, 2)
+    master.submit(99, 4, 1, 2)
+    sleep(0.25)
+    assert master.execute(1, 4, 55, 2) == tuple(server.simulator.registers[x] for x in (55, 56))
+    master.close()
+
+
+def test_disconnect(server):
+    master = PipelinedTcpMaster(*server.address, window=2)
+    transaction = master.submit(99, 4, 1, 2)
+    master.close()
+    with pytest.raises(IOError):
+        transaction.result()
+    # Reconnects on the next request
+    assert len(master.execute(1, 4, 1, 6)) == 6
+    master.close()
@@ -0,0 +1,78 @@
+# -*- encoding: utf-8 -*-
+from __future__ import print_function, unicode_literals, division
+import socket
+from threading import Thread
+import pytest
+from siemens.pac import PACx200
+from siemens.pool import ConnectionPool
+from siemens.simulator import PACSimulator, TcpSimulator
+
+
+def test_shared_connection():
+    simulators = {1: PACSimulator(), 2: PACSimulator()}
+    simulators[2].set_floats(55, [49.9])
+    pool = ConnectionPool()
+    with TcpSimulator(simulators) as server:
+        pacs = [PACx200(*server.address, unit=unit, pool=pool) for unit in (1, 2)]
+        for _ in range(3):
+            for pac in pacs:
+                pac.read()
+                pac.close()
+        connections = server.connections
+        pool.close()
+
+    assert pacs[0]._master is pacs[1]._master
+    assert connections == 1
+    assert pacs[0].frequency == pytest.approx(50.02)
+    assert pacs[1].frequency == pytest.approx(49.9)
+    assert simulators[1].requests == simulators[2].requests == 6
+
+
+def test_concurrency_limit():
+    simulators = dict((unit, PACSimulator(latency=0.05)) for unit in range(1, 5))
+    pool = ConnectionPool(max_concurrent=2)
+    with TcpSimulator(simulators) as server:
+        pacs = [PACx200(*server.address, unit=unit, pool=pool) for unit in simulators]
+        threads = [Thread(target=pac.read_power) for pac in pacs]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        connections = server.connections
+        pool.close()
+
+    assert connections == 2
+    assert all(pac.power.active == pytest.approx(3450) for pac in pacs)
+
+
+def test_backoff():
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    address = listener.getsockname()
+    listener.close()
+
+    pool = ConnectionPool(timeout=0.5, min_backoff=60)
+    pac = PACx200(*address, pool=pool)
+    with pytest.raises(socket.error):
+        pac.read_power()
+    with pytest.raises(IOError) as error:
+        pac.read_power()
+    assert 'backing off' in str(error.value)
+    pool.close()
+
+
+def test_unit_timeout():
+    simulators = {1: PACSimulator(), 2: PACSimulator(drop_rate=1)}
+    pool = ConnectionPool(timeout=0.2, min_backoff=60)
+    with TcpSimulator(simulators) as server:
+        pacs = [PACx200(*server.address, unit=unit, pool=pool) for unit in (1, 2)]
+        pacs[0].read_power()
+        with pytest.raises(socket.timeout):
+            pacs[1].read_power()
+        # Only the connection is reopened, healthy units aren't backed off
+        pacs[0].read_frequency()
+        connections = server.connections
+        pool.close()
+
+    assert connections == 2
+    assert pacs[0].frequency == pytest.approx(50.02)
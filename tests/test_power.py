@@ -45,3 +45,9 @@ def test_mul():
     assert p_total.apparent == 1000 / 2
     assert p_total.active == p1.active / 2
     assert p_total.reactive == p1.reactive / 2
+
+
+def test_slots():
+    p1 = Power(1, 1, 1)
+    assert not hasattr(p1, '__dict__')
+    assert (p1 * 3600).as_dict() == Energy(1, 1, 1).as_dict()
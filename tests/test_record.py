@@ -0,0 +1,66 @@
+# -*- encoding: utf-8 -*-
+from __future__ import print_function, unicode_literals, division
+import io
+import json
+from math import isnan
+from siemens.pac import PAC
+from siemens.record import SCHEMA, RECORD, to_ndjson, write_csv, pack_record, unpack_record
+from tests.test_pac import make_pac
+
+
+def make_record():
+    pac = make_pac()
+    pac.read()
+    return pac, pac.to_record(timestamp=1000.0)
+
+
+def test_schema():
+    assert SCHEMA['version'] == 1
+    assert len(SCHEMA['fields']) == len(SCHEMA['units']) == len(PAC.FIELDS) + 1
+    assert dict(zip(SCHEMA['fields'], SCHEMA['units']))['phases.L1.power.reactive'] == 'VAR'
+    assert dict(zip(SCHEMA['fields'], SCHEMA['units']))['tariffs.1.import.apparent'] == 'VAh'
+
+
+def test_as_flat():
+    pac = make_pac()
+    pac.read()
+    pac.frequency = float('nan')
+    flat = pac.as_flat()
+
+    assert flat['power.active'] == 1200
+    assert flat['phases.L2.voltage'] == 231
+    assert isnan(flat['frequency'])
+    assert pac.as_flat(replace_nan=True)['frequency'] == 0
+
+
+def test_ndjson():
+    pac, record = make_record()
+    pac.frequency = float('nan')
+    lines = to_ndjson([record, pac.to_record(timestamp=1001.0)]).splitlines()
+
+    assert len(lines) == 2
+    first, second = [dict(zip(SCHEMA['fields'], json.loads(line))) for line in lines]
+    assert first['timestamp'] == 1000
+    assert first['power.active'] == 1200
+    assert first['frequency'] == 50
+    assert second['frequency'] is None
+
+
+def test_csv():
+    _, record = make_record()
+    record = record[:-1] + (float('nan'), )
+    output = io.StringIO()
+    write_csv(output, [record])
+    header, row = output.getvalue().splitlines()
+
+    assert header.split(',') == list(SCHEMA['fields'])
+    assert row.split(',')[0] == '1000.0'
+    assert row.split(',')[-1] == ''
+
+
+def test_pack():
+    _, record = make_record()
+    data = pack_record(record)
+
+    assert len(data) == RECORD.size == 8 * len(SCHEMA['fields'])
+    assert unpack_record(data) == record
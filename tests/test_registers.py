@@ -0,0 +1,81 @@
+# -*- encoding: utf-8 -*-
+from __future__ import print_function, unicode_literals, division
+import pytest
+from siemens.registers import (
+    REGISTERS, ReadBlock, plan_reads, split_block, decode, decode_array, encode, to_bytes, from_bytes,
+    merge_ranges, merge_writes)
+
+
+def test_plan_merge():
+    plan = plan_reads(REGISTERS)
+
+    assert len(plan) == 2
+    assert plan[0] == ReadBlock(1, 66, ('phases', 'frequency', 'power'))
+    assert plan[1] == ReadBlock(801, 40, ('energy', ))
+
+
+def test_plan_single():
+    assert plan_reads(['power']) == [ReadBlock(63, 4, ('power', ))]
+
+
+def test_plan_limits():
+    # Gap between phases and frequency is 24 registers
+    plan = plan_reads(['phases', 'frequency', 'power'], max_gap=10)
+    assert plan == [ReadBlock(1, 30, ('phases', )), ReadBlock(55, 12, ('frequency', 'power'))]
+
+    plan = plan_reads(['phases', 'frequency', 'power'], max_count=60)
+    assert plan == [ReadBlock(1, 56, ('phases', 'frequency')), ReadBlock(63, 4, ('power', ))]
+
+
+def test_merge_ranges():
+    assert merge_ranges([(809, 4), (801, 4), (900, 2)]) == [(801, 12), (900, 2)]
+    assert merge_ranges([(1, 4), (3, 4), (20, 1)], max_gap=5) == [(1, 6), (20, 1)]
+    assert merge_ranges([(1, 100), (101, 100)]) == [(1, 100), (101, 100)]
+
+
+def test_merge_writes():
+    registers = dict((x, x % 7) for x in range(801, 841))
+    registers[900] = 1
+    assert merge_writes(registers) == [(801, [x % 7 for x in range(801, 841)]), (900, [1])]
+    assert [len(values) for _, values in merge_writes(dict.fromkeys(range(300), 0))] == [123, 123, 54]
+
+
+def test_split():
+    block = ReadBlock(1, 66, ('phases', 'frequency', 'power'))
+    values = dict(split_block(block, list(range(1, 67))))
+
+    assert values['phases'] == list(range(1, 31))
+    assert values['frequency'] == [55, 56]
+    assert values['power'] == [63, 64, 65, 66]
+
+
+def test_decode():
+    registers = encode([1.5, -2.0, float('inf')], 'f')
+
+    assert len(registers) == 6
+    assert decode(registers, 'f') == (1.5, -2.0, float('inf'))
+    assert decode(to_bytes(registers), 'f') == (1.5, -2.0, float('inf'))
+    assert from_bytes(to_bytes(registers)) == registers
+
+    registers = encode([1e12, 0.1], 'd')
+    assert len(registers) == 8
+    assert decode(registers, 'd') == (1e12, 0.1)
+
+
+def test_split_bytes():
+    block = ReadBlock(55, 12, ('frequency', 'power'))
+    registers = encode([50, 0, 0, 0, 1388, 1200], 'f')
+    values = dict(split_block(block, to_bytes(registers)))
+
+    assert decode(values['frequency']) == (50, )
+    assert decode(values['power']) == (1388, 1200)
+
+
+def test_decode_array():
+    numpy = pytest.importorskip('numpy')
+    data = to_bytes(encode([1.5, 2.5], 'd'))
+    values = decode_array(data, 'd')
+
+    assert isinstance(values, numpy.ndarray)
+    assert values.tolist() == [1.5, 2.5]
+    assert decode_array(encode([1.5], 'f')).tolist() == [1.5]
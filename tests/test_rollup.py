@@ -0,0 +1,56 @@
+# -*- encoding: utf-8 -*-
+from __future__ import print_function, unicode_literals, division
+from math import isnan
+from siemens.rollup import FIELDS, Rollup
+from tests.test_pac import make_pac
+
+
+def test_windows():
+    rollup = Rollup(windows=(10, 30), fields=['power.active', 'frequency'])
+    finished = []
+    # Active power 0, 10, 20, ... every 5 seconds, frequency missing after 20 s
+    for i in range(13):
+        finished += rollup.add(i * 5.0, [i * 10.0, 50.0 if i < 4 else float('nan')])
+
+    assert [(aggregate.window, aggregate.start) for aggregate in finished] == [
+        (10, 0), (10, 10), (10, 20), (30, 0), (10, 30), (10, 40), (10, 50), (30, 30)]
+
+    stats = finished[1].stats['power.active']
+    assert (stats.count, stats.min, stats.max, stats.mean, stats.last) == (2, 20, 30, 25, 30)
+    # 10 held for 10..15, 20 for 15..20, 30 for 20..25
+    assert stats.time_weighted_mean == 25
+
+    stats = finished[3].stats['power.active']
+    assert (stats.count, stats.min, stats.max, stats.mean) == (6, 0, 50, 25)
+    assert stats.time_weighted_mean == 25
+    # Frequency was only known for 0..20
+    stats = finished[3].stats['frequency']
+    assert (stats.count, stats.mean, stats.time_weighted_mean) == (4, 50, 50)
+    stats = finished[4].stats['frequency']
+    assert stats.count == 0 and isnan(stats.mean) and isnan(stats.time_weighted_mean)
+
+    remaining = rollup.flush()
+    assert [(aggregate.window, aggregate.start) for aggregate in remaining] == [(10, 60), (30, 60)]
+    assert remaining[0].stats['power.active'].last == 120
+    assert rollup.flush() == []
+
+
+def test_time_weighted():
+    rollup = Rollup(windows=(60, ), fields=['power.active'])
+    rollup.add(0, [100.0])
+    rollup.add(50, [1000.0])
+    rollup.add(59, [1000.0])
+    stats = rollup.add(60, [0.0])[0].stats['power.active']
+    assert stats.mean == 700
+    assert stats.time_weighted_mean == 250
+
+
+def test_add_pac():
+    rollup = Rollup(windows=(1, ))
+    pac = make_pac()
+    pac.read()
+    assert rollup.add_pac(pac, timestamp=0.5) == []
+    aggregate = rollup.add_pac(pac, timestamp=1.5)[0]
+    assert sorted(aggregate.stats) == sorted(FIELDS)
+    assert aggregate.stats['frequency'].last == 50
+    assert aggregate.stats['phases.L3.voltage'].max == 232
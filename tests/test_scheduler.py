@@ -0,0 +1,32 @@
+# -*- encoding: utf-8 -*-
+from __future__ import print_function, unicode_literals, division
+from siemens.scheduler import AcquisitionScheduler
+from tests.test_pac import make_pac
+
+
+def test_schedule():
+    pac = make_pac()
+    scheduler = AcquisitionScheduler(pac, {'power': 0.02, 'phases': 0.06, 'frequency': 0.06, 'energy': 1})
+    runs = scheduler.run()
+    reads = [next(runs) for _ in range(7)]
+
+    assert reads[0] == ['energy', 'frequency', 'phases', 'power']
+    assert reads[1] == ['power']
+    assert reads[2] == ['power']
+    assert reads[3] == ['frequency', 'phases', 'power']
+    assert reads[6] == ['frequency', 'phases', 'power']
+    # Power, phases and frequency are read together in a single transaction
+    assert pac.transactions == 1
+    assert pac._master.transactions == 2 + 5 + 1
+    assert pac.timestamps['power'] > pac.timestamps['energy']
+    assert pac.timestamps['power'] == pac.timestamps['phases']
+
+
+def test_poll():
+    pac = make_pac()
+    scheduler = AcquisitionScheduler(pac, {'power': 10, 'energy': 60})
+
+    assert scheduler.poll() == ['energy', 'power']
+    assert scheduler.poll() == []
+    assert pac.power.active == 1200
+    assert sorted(pac.timestamps) == ['energy', 'power']
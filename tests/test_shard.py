@@ -0,0 +1,80 @@
+# -*- encoding: utf-8 -*-
+from __future__ import print_function, unicode_literals, division
+from math import isnan
+from time import sleep, time
+import pytest
+from siemens.pac import PAC
+from siemens import shard
+from siemens.shard import SharedTable, ShardedPoller
+from tests.test_fleet import BrokenMaster
+from tests.test_pac import make_pac
+
+
+def broken_pac():
+    pac = make_pac()
+    pac._master = BrokenMaster()
+    return pac
+
+
+def test_table():
+    table = SharedTable(3)
+    other = SharedTable(name=table.name)
+    try:
+        assert other.rows == 3
+        assert table.snapshot() == [None, None, None]
+
+        pac = make_pac()
+        pac.read()
+        table.write(1, 100.0, pac.values())
+        table.fail(1)
+        table.fail(2)
+
+        first, second, third = other.snapshot()
+        assert first is None
+        assert (second.timestamp, second.failures) == (100, 1)
+        assert second.values == pac.values()
+        assert third.failures == 1 and isnan(third.timestamp)
+        with pytest.raises(IndexError):
+            table.read(3)
+    finally:
+        other.close()
+        table.close()
+
+
+def test_dead_writer():
+    table = SharedTable(1, timeout=0.05)
+    try:
+        table.write(0, 100.0, [1.0] * len(PAC.FIELDS))
+        # Writer died mid-write, leaving the sequence odd
+        shard._SEQUENCE.pack_into(table._memory.buf, shard.HEADER.size, 3)
+        started = time()
+        reading = table.read(0)
+        assert 0.05 <= time() - started < 1
+        assert reading.stale and reading.timestamp == 100
+
+        # A new writer recovers the row
+        table.fail(0)
+        reading = table.read(0)
+        assert not reading.stale and reading.failures == 1
+    finally:
+        table.close()
+
+
+def test_poller():
+    devices = {'a': make_pac, 'b': make_pac, 'c': make_pac, 'broken': broken_pac}
+    with ShardedPoller(devices, processes=2, interval=0.05, start_method='spawn') as poller:
+        deadline = time() + 30
+        while time() < deadline:
+            readings = dict(zip(poller.keys, poller.table.snapshot()))
+            if all(reading is not None for reading in readings.values()):
+                break
+            sleep(0.05)
+
+        for key in ('a', 'b', 'c'):
+            values = dict(zip(PAC.FIELDS, readings[key].values))
+            assert readings[key].failures == 0
+            assert values['power.active'] == 1200
+            assert values['phases.L2.current'] == 2
+            assert values['tariffs.1.export.active'] == 4
+        assert readings['broken'].failures >= 1
+        assert isnan(readings['broken'].values[0])
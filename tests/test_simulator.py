@@ -0,0 +1,90 @@
+# -*- encoding: utf-8 -*-
+from __future__ import print_function, unicode_literals, division
+import socket
+import pytest
+from modbus_tk.exceptions import ModbusError
+from siemens.bus import RtuBus
+from siemens.pac import PACx200, PAC3100
+from siemens.simulator import PACSimulator, TcpSimulator, RtuSimulator, SLAVE_DEVICE_FAILURE
+
+
+def assert_values(pac):
+    assert pac.power.apparent == pytest.approx(3732.8)
+    assert pac.power.active == pytest.approx(3450.0)
+    assert pac.L2.voltage == pytest.approx(229.8)
+    assert pac.L3.current == pytest.approx(6.1)
+    assert pac.L1.power.active == pytest.approx(1100.0)
+    assert pac.frequency == pytest.approx(50.02)
+    assert pac.tariff_1.energy_import.active == 152000
+    assert pac.tariff_2.energy_import.apparent == 45000
+
+
+def test_tcp_read():
+    simulator = PACSimulator()
+    with TcpSimulator(simulator) as server:
+        pac = PACx200(*server.address)
+        pac.read()
+        pac.close()
+
+    assert simulator.requests == 2
+    assert_values(pac)
+
+
+def test_tcp_clear_tariff():
+    simulator = PACSimulator()
+    with TcpSimulator(simulator) as server:
+        pac = PACx200(*server.address)
+        pac.read()
+        pac.clear_tariff(1)
+        pac.close()
+
+    assert pac.tariff_1.energy_import.active == 0
+    assert pac.tariff_1.energy_export.reactive == 0
+    assert pac.tariff_1.energy_import.apparent == 0
+    assert pac.tariff_2.energy_import.active == 43000
+
+
+def test_tcp_faults():
+    simulator = PACSimulator(error_rate=1)
+    with TcpSimulator(simulator) as server:
+        pac = PACx200(*server.address)
+        with pytest.raises(ModbusError) as error:
+            pac.read_power()
+        assert error.value.get_exception_code() == SLAVE_DEVICE_FAILURE
+
+        simulator.error_rate = 0
+        simulator.drop_rate = 1
+        pac._master.set_timeout(0.1)
+        with pytest.raises(socket.timeout):
+            pac.read_power()
+        pac.close()
+
+
+def test_rtu_read():
+    pytest.importorskip('tty')
+    simulator = PACSimulator()
+    with RtuSimulator(simulator) as server:
+        pac = PAC3100(server.port, baudrate=19200)
+        pac.read()
+        assert_values(pac)
+        pac.clear_tariff(2)
+        pac.close()
+
+    assert pac.tariff_2.energy_import.active == 0
+    assert pac.tariff_1.energy_import.active == 152000
+
+
+def test_rtu_bus():
+    pytest.importorskip('tty')
+    simulators = {unit: PACSimulator() for unit in (1, 2, 3)}
+    simulators[2].set_floats(55, [49.9])
+    with RtuSimulator(simulators) as server:
+        bus = RtuBus(server.port, baudrate=19200)
+        devices = [bus.device(unit) for unit in (1, 2, 3)]
+        for device in devices:
+            device.read()
+        bus.close()
+
+    assert devices[0].frequency == pytest.approx(50.02)
+    assert devices[1].frequency == pytest.approx(49.9)
+    assert all(simulator.requests == 2 for simulator in simulators.values())
@@ -0,0 +1,84 @@
+# -*- encoding: utf-8 -*-
+from __future__ import print_function, unicode_literals, division
+import os
+import pytest
+from siemens.storage import FIELDS, SampleLog
+from tests.test_pac import make_pac
+
+
+def fill(log, count):
+    for i in range(count):
+        log.append(float(i), [float(i) + x / 100 for x in range(len(FIELDS))])
+
+
+def test_fields():
+    assert len(FIELDS) == 31
+    assert 'phases.L2.current' in FIELDS
+    assert 'tariffs.1.export.reactive' in FIELDS
+    assert 'balance.active' not in FIELDS
+
+
+def test_query(tmpdir):
+    log = SampleLog(str(tmpdir), segment_records=100, index_interval=8)
+    fill(log, 250)
+
+    assert len(log) == 250
+    assert len(os.listdir(str(tmpdir))) == 3
+
+    rows = list(log.query(95.5, 105, fields=['frequency', 'power.active']))
+    assert [row[0] for row in rows] == list(range(96, 105))
+    assert rows[0][1] == 96 + FIELDS.index('frequency') / 100
+    assert rows[0][2] == 96 + FIELDS.index('power.active') / 100
+
+    timestamps, values = log.column('phases.L2.current', since=240)
+    assert timestamps == list(range(240, 250))
+    assert values[0] == 240 + FIELDS.index('phases.L2.current') / 100
+    assert len(list(log.query(until=0))) == 0
+    assert len(list(log.query())) == 250
+    log.close()
+
+
+def test_reopen(tmpdir):
+    log = SampleLog(str(tmpdir), segment_records=100, index_interval=8)
+    fill(log, 150)
+    log.close()
+
+    log = SampleLog(str(tmpdir), segment_records=100, index_interval=8)
+    assert len(log) == 150
+    with pytest.raises(ValueError):
+        log.append(10.0, [0.0] * len(FIELDS))
+    log.append(150.0, [1.0] * len(FIELDS))
+    assert log.column('frequency', since=149)[0] == [149, 150]
+    assert len(os.listdir(str(tmpdir))) == 2
+    log.close()
+
+
+def test_reopen_partial_record(tmpdir):
+    log = SampleLog(str(tmpdir))
+    fill(log, 3)
+    log.close()
+    path = str(tmpdir.join('00000000.seg'))
+    with open(path, 'ab') as f:
+        f.write(b'\x00' * 17)
+
+    log = SampleLog(str(tmpdir))
+    assert len(log) == 3
+    log.append(3.0, [3.0] * len(FIELDS))
+    log.append(4.0, [4.0] * len(FIELDS))
+    log.flush()
+    assert [row[:2] for row in log.query(fields=['frequency'])] == [
+        (0, FIELDS.index('frequency') / 100), (1, 1 + FIELDS.index('frequency') / 100),
+        (2, 2 + FIELDS.index('frequency') / 100), (3, 3), (4, 4),
+    ]
+    log.close()
+
+
+def test_append_pac(tmpdir):
+    pac = make_pac()
+    pac.read()
+    log = SampleLog(str(tmpdir))
+    log.append_pac(pac, timestamp=1000)
+
+    row = list(log.query(fields=['power.active', 'phases.L3.voltage', 'tariffs.1.export.active']))
+    assert row == [(1000, 1200, 232, 4)]
+    log.close()
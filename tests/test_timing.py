@@ -0,0 +1,42 @@
+# -*- encoding: utf-8 -*-
+from __future__ import print_function, unicode_literals, division
+from time import sleep
+import pytest
+from siemens.timing import Ticker, monotonic
+
+
+def test_ticker():
+    ticker = Ticker(0.05)
+    start = monotonic()
+
+    assert ticker.wait() == 0
+    sleep(0.03)
+    assert ticker.wait() == 0
+    assert 0.045 < monotonic() - start < 0.09
+    assert ticker.tick == 1
+
+
+def test_ticker_missed():
+    ticker = Ticker(0.02)
+    ticker.wait()
+    sleep(0.07)
+
+    # Ticks at 0.02 and 0.04 are skipped, tick at 0.06 is late and runs immediately
+    delay, missed = ticker.delay()
+    assert missed == 2
+    assert delay == 0
+    assert ticker.tick == 3
+
+    delay, missed = ticker.delay()
+    assert missed == 0
+    assert 0 < delay <= 0.02
+
+
+def test_ticker_zero_interval():
+    ticker = Ticker(0)
+    assert [ticker.wait() for _ in range(3)] == [0, 0, 0]
+    assert ticker.tick == 2
+    assert ticker.delay() == (0.0, 0)
+
+    with pytest.raises(ValueError):
+        Ticker(-1)